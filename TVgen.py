@@ -40,12 +40,9 @@ def LFSR_234(startSeed):
 
     return testVector
 
-def TestVector_A(inputSize, startSeed):
+def VectorList_A(inputSize, startSeed):
     outVect = ''        #output vector at each line
-    outputName = "TV_A.txt"
-
-    outputFile = open(outputName,"w")
-    outputFile.write("#seed: " + str(startSeed) + "\n")
+    vectors = []        #list of output vectors
     #we have to deduce the number of seeds based on the inputs size and 8bit seed size
     #numSeeds = math.ceil(inputSize / 8)
     for _ in range(255):
@@ -56,19 +53,18 @@ def TestVector_A(inputSize, startSeed):
         outVect = outVect[0:inputSize]
         outVect = outVect[::-1]
 
-        outputFile.write(outVect + '\n')
+        vectors.append(outVect)
         outVect = ''
 
+    return vectors
+
 
 #multiple 8-bit counters
-def TestVector_B(inputSize, startSeed):
+def VectorList_B(inputSize, startSeed):
     vectorList = []     #list of Vectors 0-255
     newSeed = 0         #next seed vector in sequence
     outVect = ''        #output vector at each line
-    outputName = "TV_B.txt"
-
-    outputFile = open(outputName,"w")
-    outputFile.write("#seed: " + str(startSeed) + "\n")
+    vectors = []        #list of output vectors
     #we have to deduce the number of seeds based on the inputs size and 8bit seed size
     numSeeds = math.ceil(inputSize / 8)
 
@@ -90,18 +86,17 @@ def TestVector_B(inputSize, startSeed):
         #Reverses string so output vector is from s[n], s[n-1], s[s-2] ... s[0]
         outVect = outVect[::-1]
 
-        #Writes and resets for the next output
-        outputFile.write(outVect + '\n')
+        #Stores and resets for the next output
+        vectors.append(outVect)
         outVect = ''
 
-def TestVector_C(inputSize, startSeed):
+    return vectors
+
+def VectorList_C(inputSize, startSeed):
     vectorList = []     #list of Vectors 0-255
     newSeed = 0         #next seed vector in sequence
     outVect = ''        #output vector at each line
-    outputName = "TV_C.txt"
-
-    outputFile = open(outputName,"w")
-    outputFile.write("#seed: " + str(startSeed) + "\n")
+    vectors = []        #list of output vectors
     #we have to deduce the number of seeds based on the inputs size and 8bit seed size
     numSeeds = math.ceil(inputSize / 8)
 
@@ -124,19 +119,18 @@ def TestVector_C(inputSize, startSeed):
         #Reverses string so output vector is from s[n], s[n-1], s[s-2] ... s[0]
         outVect = outVect[::-1]
 
-        #Writes and resets for the next output
-        outputFile.write(outVect + '\n')
+        #Stores and resets for the next output
+        vectors.append(outVect)
         outVect = ''
 
+    return vectors
 
-def TestVector_D(inputSize, startSeed):
+
+def VectorList_D(inputSize, startSeed):
     vectorList = []     #list of Vectors 0-255
     newSeed = 0         #next seed vector in sequence
     outVect = ''        #output vector at each line
-    outputName = "TV_D.txt"
-
-    outputFile = open(outputName,"w")
-    outputFile.write("#seed: " + str(startSeed) + "\n")
+    vectors = []        #list of output vectors
     #we have to deduce the number of seeds based on the inputs size and 8bit seed size
     numSeeds = math.ceil(inputSize / 8)
 
@@ -158,21 +152,20 @@ def TestVector_D(inputSize, startSeed):
         #Reverses string so output vector is from s[n], s[n-1], s[s-2] ... s[0]
         outVect = outVect[::-1]
 
-        #Writes and resets for the next output
-        outputFile.write(outVect + '\n')
+        #Stores and resets for the next output
+        vectors.append(outVect)
         outVect = ''
 
+    return vectors
+
 
 # Test Vector E --> Multiple 8 bit LFSRS
-def TestVector_E(inputSize, startSeed):
+def VectorList_E(inputSize, startSeed):
 
     vectorList = []     #list of Vectors 0-255
     newSeed = 0         #next seed vector in sequence
     outVect = ''        #output vector at each line
-    outputName = "TV_E.txt"
-
-    outputFile = open(outputName,"w")
-    outputFile.write("#seed: " + str(startSeed) + "\n")
+    vectors = []        #list of output vectors
     #we have to deduce the number of seeds based on the inputs size and 8bit seed size
     numSeeds = math.ceil(inputSize / 8)
 
@@ -195,6 +188,35 @@ def TestVector_E(inputSize, startSeed):
         #Reverses string so output vector is from s[n], s[n-1], s[s-2] ... s[0]
         outVect = outVect[::-1]
 
-        #Writes and resets for the next output
+        #Stores and resets for the next output
+        vectors.append(outVect)
+        outVect = ''
+
+    return vectors
+
+
+# Writes a list of vectors out to a test vector file with the seed header
+def writeVectors(outputName, startSeed, vectors):
+    outputFile = open(outputName,"w")
+    outputFile.write("#seed: " + str(startSeed) + "\n")
+    for outVect in vectors:
         outputFile.write(outVect + '\n')
-        outVect = ''
\ No newline at end of file
+    outputFile.close()
+
+def TestVector_A(inputSize, startSeed):
+    writeVectors("TV_A.txt", startSeed, VectorList_A(inputSize, startSeed))
+
+def TestVector_B(inputSize, startSeed):
+    writeVectors("TV_B.txt", startSeed, VectorList_B(inputSize, startSeed))
+
+def TestVector_C(inputSize, startSeed):
+    writeVectors("TV_C.txt", startSeed, VectorList_C(inputSize, startSeed))
+
+def TestVector_D(inputSize, startSeed):
+    writeVectors("TV_D.txt", startSeed, VectorList_D(inputSize, startSeed))
+
+def TestVector_E(inputSize, startSeed):
+    writeVectors("TV_E.txt", startSeed, VectorList_E(inputSize, startSeed))
+
+#generator name -> vector list function, used when vectors are needed without writing files
+GENERATORS = {"A": VectorList_A, "B": VectorList_B, "C": VectorList_C, "D": VectorList_D, "E": VectorList_E}
@@ -0,0 +1,262 @@
+from __future__ import print_function
+
+# Bit-parallel (pattern-parallel) logic and fault simulation.
+#
+# Every net holds a python int where bit v is the value of that net under test vector v, so one pass over the
+# gate list simulates a whole batch of vectors at once. The circuit dictionary from netRead is compiled once into
+# integer-indexed, topologically ordered gates so the same precompiled state can be shared by every run.
+#
+# Flip-flops (DFF) of sequential circuits are cut: their outputs are treated like extra inputs (the present state)
+# and their D lines like extra outputs (the next state). seqsim does the clocking.
+#
+# Function List:
+# 0. compileCircuit: turns the netRead circuit dictionary into a levelized, integer-indexed netlist
+# 1. packVectors: packs a list of test vector strings into one bit mask per primary input
+# 2. evalGate: calculates the packed output value for one gate
+# 3. simulate: good-machine simulation of all the packed vectors
+# 4. parseFault: turns one f_list.txt fault into an integer-indexed fault
+# 5. faultCone: returns the gates (in topological order) that a fault site can affect
+# 6. detectMask: bit mask of the vectors that detect one fault
+# 7. firstDetect: index of the first vector set in a detection mask
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: compiles the circuit dictionary made in netRead
+def compileCircuit(circuit):
+    # every wire gets an integer index, inputs first so input i is net i, then the flip-flop outputs
+    dffs = circuit.get("DFFS", ["DFF list", []])[1]
+    names = list(circuit["INPUTS"][1]) + list(dffs)
+    for gate in circuit["GATES"][1]:
+        names.append(gate)
+    index = {}
+    for i in range(len(names)):
+        index[names[i]] = i
+
+    # levelize the gates: a gate's level is one more than its deepest fanin
+    level = {}
+    for x in circuit["INPUTS"][1] + dffs:
+        level[x] = 0
+    pending = list(circuit["GATES"][1])
+    while len(pending) > 0:
+        waiting = []
+        for gate in pending:
+            terms = circuit[gate][1]
+            if all(term in level for term in terms):
+                level[gate] = 1 + max([level[term] for term in terms] + [0])
+            else:
+                waiting.append(gate)
+
+        # Error detection: nothing could be placed, so a fanin is missing or there is a loop
+        if len(waiting) == len(pending):
+            msg = "NETLIST ERROR: GATE LINE \"" + waiting[0] + "\" CAN NOT BE LEVELIZED"
+            print(msg + "\n")
+            return msg
+        pending = waiting
+
+    order = sorted(circuit["GATES"][1], key=lambda gate: level[gate])
+
+    # gate list: (output net, logic, fanin nets), in topological order
+    gates = []
+    fanout = [[] for _ in names]
+    for gate in order:
+        fanins = tuple([index[term] for term in circuit[gate][1]])
+        for term in fanins:
+            fanout[term].append(len(gates))
+        gates.append((index[gate], circuit[gate][0], fanins))
+
+    # position of each gate in the gate list, by output net
+    gatePos = {}
+    for pos in range(len(gates)):
+        gatePos[gates[pos][0]] = pos
+
+    compiled = {}
+    compiled["NAMES"] = names
+    compiled["INDEX"] = index
+    compiled["INPUTS"] = list(range(len(circuit["INPUTS"][1])))
+    compiled["OUTPUTS"] = [index[x] for x in circuit["OUTPUTS"][1]]
+    compiled["DFFS"] = [(index[x], index[circuit[x][1][0]]) for x in dffs]
+    compiled["GATES"] = gates
+    compiled["GATE_POS"] = gatePos
+    compiled["FANOUT"] = fanout
+    compiled["LEVEL"] = [level[x] for x in names]
+    compiled["CONES"] = {}
+    return compiled
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: packs test vector strings into one int per input (bit v = the input's value in vector v)
+def packVectors(lines, width):
+    masks = []
+    # the first character of a line belongs to the last input, same as inputRead
+    for i in range(width):
+        column = [line[len(line) - 1 - i] for line in lines]
+        # vector 0 has to end up in the least significant bit
+        column.reverse()
+        masks.append(int("".join(column), 2) if len(column) > 0 else 0)
+    return masks
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: calculates the packed output of one gate, ones has a 1 in every vector position being simulated
+def evalGate(logic, values, ones):
+    if logic == "NAND":
+        value = ones
+        for x in values:
+            value &= x
+        return value ^ ones
+    if logic == "AND":
+        value = ones
+        for x in values:
+            value &= x
+        return value
+    if logic == "NOR":
+        value = 0
+        for x in values:
+            value |= x
+        return value ^ ones
+    if logic == "OR":
+        value = 0
+        for x in values:
+            value |= x
+        return value
+    if logic == "NOT":
+        return values[0] ^ ones
+    if logic == "BUFF":
+        return values[0]
+    if logic == "XOR":
+        value = 0
+        for x in values:
+            value ^= x
+        return value
+    if logic == "XNOR":
+        value = 0
+        for x in values:
+            value ^= x
+        return value ^ ones
+    if logic == "CONST0":
+        return 0
+    if logic == "CONST1":
+        return ones
+
+    # Error detection... should not be able to get at this point
+    return logic
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: simulates every packed vector through the good circuit, returns the packed value of every net
+def simulate(compiled, inputMasks, ones):
+    values = [0] * len(compiled["NAMES"])
+    for i in compiled["INPUTS"]:
+        values[i] = inputMasks[i] & ones
+
+    for out, logic, fanins in compiled["GATES"]:
+        value = evalGate(logic, [values[term] for term in fanins], ones)
+
+        # ERROR Detection if LOGIC does not exist
+        if isinstance(value, str):
+            print("LOGIC ERROR: \"" + value + "\" IS NOT A SUPPORTED GATE")
+            return value
+        values[out] = value
+
+    return values
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: turns a split fault line from f_list.txt into indexes of the compiled circuit
+# SA faults:  ["net", "SA", "v"]                  -> ("SA", net index, v)
+# IN faults:  ["gate", "IN", "net", "SA", "v"]    -> ("IN", gate position, (pin positions), v)
+def parseFault(compiled, fault):
+    index = compiled["INDEX"]
+
+    if fault[1] == "SA":
+        net = "wire_" + fault[0]
+        if net not in index:
+            return "FAULT ERROR: LINE \"" + net + "\" NOT IN NETLIST"
+        return ("SA", index[net], int(fault[2]))
+
+    if fault[1] == "IN":
+        gate = "wire_" + fault[0]
+        net = "wire_" + fault[2]
+        if gate not in index or index[gate] not in compiled["GATE_POS"]:
+            return "FAULT ERROR: GATE \"" + gate + "\" NOT IN NETLIST"
+        pos = compiled["GATE_POS"][index[gate]]
+
+        # same as the original simulator: every pin of the gate connected to the net gets the fault
+        pins = []
+        fanins = compiled["GATES"][pos][2]
+        for pin in range(len(fanins)):
+            if compiled["NAMES"][fanins[pin]] == net:
+                pins.append(pin)
+        if len(pins) == 0:
+            return "FAULT ERROR: LINE \"" + net + "\" IS NOT AN INPUT OF \"" + gate + "\""
+        return ("IN", pos, tuple(pins), int(fault[4]))
+
+    return "FAULT ERROR: UNKNOWN FAULT TYPE \"" + fault[1] + "\""
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: positions of the gates downstream of a net, in topological order (cached in the compiled circuit)
+def faultCone(compiled, net):
+    cones = compiled["CONES"]
+    if net in cones:
+        return cones[net]
+
+    gates = compiled["GATES"]
+    fanout = compiled["FANOUT"]
+    seen = set()
+    stack = list(fanout[net])
+    while len(stack) > 0:
+        pos = stack.pop()
+        if pos in seen:
+            continue
+        seen.add(pos)
+        stack.extend(fanout[gates[pos][0]])
+
+    cone = sorted(seen)
+    cones[net] = cone
+    return cone
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: simulates one fault against the good values, returns a mask of the vectors that detect it
+def detectMask(compiled, fault, good, ones):
+    gates = compiled["GATES"]
+    values = list(good)
+
+    if fault[0] == "SA":
+        net = fault[1]
+        stuck = ones if fault[2] == 1 else 0
+        # the fault is never activated by these vectors
+        if good[net] == stuck:
+            return 0
+        values[net] = stuck
+        cone = faultCone(compiled, net)
+    else:
+        pos = fault[1]
+        out, logic, fanins = gates[pos]
+        stuck = ones if fault[3] == 1 else 0
+        terms = [values[term] for term in fanins]
+        for pin in fault[2]:
+            terms[pin] = stuck
+        value = evalGate(logic, terms, ones)
+        if value == good[out]:
+            return 0
+        values[out] = value
+        cone = faultCone(compiled, out)
+
+    # only the gates the fault can reach need to be simulated again
+    for pos in cone:
+        out, logic, fanins = gates[pos]
+        values[out] = evalGate(logic, [values[term] for term in fanins], ones)
+
+    # a vector detects the fault if any primary output is different
+    mask = 0
+    for out in compiled["OUTPUTS"]:
+        mask |= values[out] ^ good[out]
+    return mask & ones
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: index of the first detecting vector in a mask, -1 if the mask is empty
+def firstDetect(mask):
+    return (mask & -mask).bit_length() - 1
@@ -0,0 +1,404 @@
+from __future__ import print_function
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import bitsim
+import netopt
+import npsim
+import seqsim
+import tvbin
+from p2sim import netRead, getFaults, genFaultList
+from TVgen import GENERATORS
+
+# Fault coverage campaigns: every circuit x generator x batch size combination of a campaign file is one job.
+# Jobs run on a local pool of worker processes, most expensive first so the long jobs do not end up last.
+# Each netlist and fault list is parsed and compiled once and shared by every job of that circuit.
+#
+# Campaign file (json):
+# {
+#     "output": "campaign_out",                       directory for the csv files, plots and index.csv
+#     "seed": 255,                                    TVgen seed, [1, 255]
+#     "batches": 25,                                  batches per job
+#     "generators": ["A", "B", "C", "D", "E"],       TVgen generators, or .tvb vector files ("TV_A.tvb")
+#     "batchSizes": [1, 2, 4, 8, 10],
+#     "workers": 4,                                   optional, defaults to the number of cpus
+#     "engine": "bitsim",                             optional, "bitsim" or "numpy" (faults side by side in numpy
+#                                                     arrays, needs numpy; faster for batches of up to ~1000 vectors)
+#     "optimize": false,                              optional, simulate faults on the netopt optimized netlist;
+#                                                     only pays off when netopt removes a good share of the gates
+#     "circuits": [
+#         {"bench": "circ.bench", "faults": "f_list.txt", "name": "c432"},
+#         "other.bench"                               fault list generated, name taken from the file
+#     ]
+# }
+#
+# Usage: python campaign.py campaign.json
+#
+# Function List:
+# 0. readCampaign: reads and checks a campaign file
+# 1. loadCircuits: parses and compiles every circuit and its fault list once
+# 2. makeJobs: builds the job list, largest first
+# 3. jobBatches: yields the packed input masks of every batch of a job
+# 4. initWorker: stores the shared circuits in the worker process
+# 5. runJob: fault simulates one circuit/generator/batch size job and writes its csv and plot
+# 6. plotJob: plots one job's csv with gnuplot
+# 7. runCampaign: runs every job on the worker pool and writes the summary index
+# 8. main: The main function
+
+# shared state of a worker process, filled in by initWorker
+workerState = {}
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: reads a campaign file and fills in the defaults
+def readCampaign(fileName):
+    inFile = open(fileName, "r")
+    campaign = json.load(inFile)
+    inFile.close()
+
+    campaign.setdefault("output", "campaign_out")
+    campaign.setdefault("seed", 255)
+    campaign.setdefault("batches", 25)
+    campaign.setdefault("generators", ["A", "B", "C", "D", "E"])
+    campaign.setdefault("batchSizes", [1])
+    campaign.setdefault("workers", None)
+    campaign.setdefault("engine", "bitsim")
+    campaign.setdefault("optimize", False)
+
+    # Error detection: values the simulation can not run with
+    if "circuits" not in campaign or len(campaign["circuits"]) == 0:
+        return "CAMPAIGN ERROR: NO CIRCUITS IN \"" + fileName + "\""
+    if campaign["seed"] < 1 or campaign["seed"] > 255:
+        return "CAMPAIGN ERROR: SEED " + str(campaign["seed"]) + " NOT IN [1, 255]"
+    if not isinstance(campaign["batches"], int) or campaign["batches"] < 1:
+        return "CAMPAIGN ERROR: BATCHES " + str(campaign["batches"]) + " IS NOT A POSITIVE INTEGER"
+    for batchSize in campaign["batchSizes"]:
+        if not isinstance(batchSize, int) or batchSize < 1:
+            return "CAMPAIGN ERROR: BATCH SIZE " + str(batchSize) + " IS NOT A POSITIVE INTEGER"
+    if campaign["engine"] not in ["bitsim", "numpy"]:
+        return "CAMPAIGN ERROR: UNKNOWN ENGINE \"" + str(campaign["engine"]) + "\""
+    for gen in campaign["generators"]:
+        if gen not in GENERATORS and not str(gen).endswith(".tvb"):
+            return "CAMPAIGN ERROR: UNKNOWN GENERATOR \"" + str(gen) + "\""
+
+    # circuits can be given as just the bench file
+    circuits = []
+    for entry in campaign["circuits"]:
+        if not isinstance(entry, dict):
+            entry = {"bench": entry}
+        entry.setdefault("name", os.path.splitext(os.path.basename(entry["bench"]))[0])
+        entry.setdefault("faults", None)
+
+        # Error detection: results, fault lists and csv files are all filed under the circuit name
+        if entry["name"] in [x["name"] for x in circuits]:
+            return "CAMPAIGN ERROR: TWO CIRCUITS ARE NAMED \"" + entry["name"] + "\", GIVE ONE OF THEM A \"name\""
+        circuits.append(entry)
+    campaign["circuits"] = circuits
+
+    return campaign
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: parses every netlist and fault list once
+# returns {circuit name: (netlists, faults, input width, plan)}, where netlists holds (compiled circuit, numpy gate
+# groups or None) for the original circuit and, when optimizing, the optimized one, faults holds (netlist, parsed
+# fault) and plan is the netopt.goodPlan that makes the original good values from the optimized ones (or None)
+def loadCircuits(campaign):
+    circuits = {}
+    for entry in campaign["circuits"]:
+        circuit = netRead(entry["bench"])
+        if isinstance(circuit, str):
+            return circuit
+
+        # circuits without a fault list get every stuck-at fault
+        faultFile = entry["faults"]
+        if faultFile is None:
+            faultFile = os.path.join(campaign["output"], entry["name"], "f_list.txt")
+            genFaultList(circuit, faultFile)
+
+        versions = [circuit]
+        opt = None
+        if campaign["optimize"]:
+            opt = netopt.optimizeCircuit(circuit)
+            if isinstance(opt, str):
+                return opt
+            versions.append(opt["CIRCUIT"])
+
+        netlists = []
+        for version in versions:
+            compiled = bitsim.compileCircuit(version)
+            if isinstance(compiled, str):
+                return compiled
+            groups = None
+            if campaign["engine"] == "numpy":
+                groups = npsim.compileGroups(compiled)
+                if isinstance(groups, str):
+                    return groups
+            netlists.append((compiled, groups))
+
+        # faults with an exact match on the optimized netlist are simulated there, the rest on the original
+        faults = []
+        for line in getFaults(faultFile):
+            which = 0
+            faultLine = line[5]
+            if opt is not None:
+                mapped = netopt.mapFault(opt, faultLine)
+                if mapped is not None:
+                    which = 1
+                    faultLine = mapped
+            fault = bitsim.parseFault(netlists[which][0], faultLine)
+            if isinstance(fault, str):
+                return fault
+            faults.append((which, fault))
+
+        plan = None
+        if opt is not None:
+            plan = netopt.goodPlan(opt, netlists[0][0], netlists[1][0])
+        circuits[entry["name"]] = (netlists, faults, circuit["INPUT_WIDTH"][1], plan)
+    return circuits
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: one job per circuit, generator and batch size, sorted so the most work starts first
+def makeJobs(campaign, circuits):
+    jobs = []
+    for entry in campaign["circuits"]:
+        netlists, faults, width, plan = circuits[entry["name"]]
+        for gen in campaign["generators"]:
+            for batchSize in campaign["batchSizes"]:
+                cost = len(netlists[0][0]["GATES"]) * len(faults) * campaign["batches"] * batchSize
+                jobs.append((cost, entry["name"], gen, batchSize))
+
+    jobs.sort(key=lambda job: -job[0])
+    return [(name, gen, batchSize, campaign["seed"], campaign["batches"], campaign["output"])
+            for cost, name, gen, batchSize in jobs]
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: yields (vector count, input masks) for each batch, TVgen vectors are packed from text and .tvb files
+# straight from their memory mapped rows
+def jobBatches(gen, width, seed, batchSize, batches):
+    if gen.endswith(".tvb"):
+        reader = tvbin.openBin(gen)
+        for start, count, inputMasks in tvbin.iterBatches(reader, batchSize):
+            if start >= batches * batchSize:
+                break
+            yield count, inputMasks
+        tvbin.closeBin(reader)
+        return
+
+    vectors = GENERATORS[gen](width, seed)
+    for batch in range(batches):
+        chunk = vectors[batch * batchSize:(batch + 1) * batchSize]
+        if len(chunk) > 0:
+            yield len(chunk), bitsim.packVectors(chunk, width)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: keeps the parsed circuits around for every job this worker runs
+def initWorker(circuits):
+    workerState["circuits"] = circuits
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: runs one job, returns its row of the summary index
+def runJob(job):
+    name, gen, batchSize, seed, batches, outDir = job
+    netlists, faults, width, plan = workerState["circuits"][name]
+    startTime = time.time()
+
+    # vector files are named after the file and carry their own seed
+    label = gen
+    if gen.endswith(".tvb"):
+        label = os.path.basename(gen)
+        reader = tvbin.openBin(gen)
+        seed = reader["SEED"]
+        tvbin.closeBin(reader)
+
+    totalFaults = len(faults)
+    active = list(range(totalFaults))
+    totalDetected = 0
+
+    baseName = name + "_" + os.path.splitext(label)[0] + "_b" + str(batchSize)
+    csvName = os.path.join(outDir, name, "f_cvg_" + baseName + ".csv")
+    csvFile = open(csvName, "w")
+    writer = csv.writer(csvFile)
+    writer.writerow(["Batch #", label, "seed = " + format(seed, "08b"), "batch size = " + str(batchSize)])
+
+    vectorsUsed = 0
+    if len(netlists[0][0]["DFFS"]) > 0:
+        # sequential circuits: the whole sequence is clocked through seqsim, then counted per batch
+        if gen.endswith(".tvb"):
+            reader = tvbin.openBin(gen)
+            view = tvbin.readRows(reader, 0, batches * batchSize)
+            # only the last width bits of a wider file are inputs, same as inputRead
+            rows = range(len(view) // reader["ROW_BYTES"])
+            sequence = [tvbin.rowString(reader, view, row)[-width:] for row in rows]
+            view.release()
+            tvbin.closeBin(reader)
+        else:
+            sequence = GENERATORS[gen](width, seed)[0:batches * batchSize]
+        firsts = [-1] * totalFaults
+        for which in range(len(netlists)):
+            ids = [f for f in range(totalFaults) if faults[f][0] == which]
+            cycles = seqsim.detectCycles(netlists[which][0], [faults[f][1] for f in ids], sequence)
+            for k in range(len(ids)):
+                firsts[ids[k]] = cycles[k]
+        for batch in range(batches):
+            last = (batch + 1) * batchSize
+            totalDetected = len([first for first in firsts if first != -1 and first < last])
+            writer.writerow([batch + 1, totalDetected / totalFaults * 100])
+        vectorsUsed = len(sequence)
+    else:
+        batch = 0
+        for count, inputMasks in jobBatches(gen, width, seed, batchSize, batches):
+            ones = (1 << count) - 1
+            # only the last netlist is simulated, with an optimized one the original values are made from it
+            good = [None] * len(netlists)
+            compiled, groups = netlists[-1]
+            if groups is None:
+                good[-1] = bitsim.simulate(compiled, inputMasks, ones)
+            else:
+                good[-1] = npsim.simulate(groups, npsim.packWords(inputMasks, count))
+            if plan is not None and any(faults[f][0] == 0 for f in active):
+                if groups is None:
+                    good[0] = netopt.originalGood(plan, netlists[0][0], good[1], ones)
+                else:
+                    good[0] = npsim.originalGood(netlists[0][1], plan, good[1])
+
+            # the numpy engine simulates all the active faults of a netlist side by side
+            masks = {}
+            for which in range(len(netlists)):
+                groups = netlists[which][1]
+                ids = [f for f in active if faults[f][0] == which]
+                if groups is not None and len(ids) > 0:
+                    found = npsim.detectMasks(groups, [faults[f][1] for f in ids], good[which], ones)
+                    for k in range(len(ids)):
+                        masks[ids[k]] = found[k]
+
+            # detected faults are dropped from the next batches
+            stillActive = []
+            for f in active:
+                which, fault = faults[f]
+                if f in masks:
+                    mask = masks[f]
+                else:
+                    mask = bitsim.detectMask(netlists[which][0], fault, good[which], ones)
+                if mask:
+                    totalDetected += 1
+                else:
+                    stillActive.append(f)
+            active = stillActive
+            vectorsUsed += count
+
+            writer.writerow([batch + 1, totalDetected / totalFaults * 100])
+            batch += 1
+
+        # batches past the end of the vectors keep the last coverage
+        for batch in range(batch, batches):
+            writer.writerow([batch + 1, totalDetected / totalFaults * 100])
+    csvFile.close()
+
+    plotName = plotJob(csvName, os.path.join(outDir, name, "plot_" + baseName + ".pdf"), name, label, batchSize)
+
+    return [name, label, batchSize, vectorsUsed, totalDetected / totalFaults * 100, csvName, plotName,
+            round(time.time() - startTime, 3)]
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: plots a job's csv the same way p2plot.gpl does, returns the pdf name ("" if gnuplot is missing)
+def plotJob(csvName, pdfName, name, gen, batchSize):
+    if shutil.which("gnuplot") is None:
+        return ""
+
+    title = gen if gen.endswith(".tvb") else "TV_" + gen
+    script = "set title '" + name + " " + title + " Fault Coverage vs Batches (batch size " + str(batchSize) + ")'\n"
+    script += "set ylabel 'Fault Coverage (%)'\n"
+    script += "set xlabel 'Batch #'\n"
+    script += "set grid\n"
+    script += "set term pdf dashed\n"
+    script += "set output '" + pdfName + "'\n"
+    script += "set datafile separator \",\"\n"
+    script += "plot '" + csvName + "' using 1:2 title '" + gen + "' with lines lt 1 lc rgb \"black\"\n"
+
+    plotProcess = subprocess.Popen(["gnuplot"], stdin=subprocess.PIPE)
+    plotProcess.communicate(script.encode())
+    return pdfName
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: runs a whole campaign, returns the summary rows
+def runCampaign(campaign):
+    for entry in campaign["circuits"]:
+        os.makedirs(os.path.join(campaign["output"], entry["name"]), exist_ok=True)
+
+    circuits = loadCircuits(campaign)
+    if isinstance(circuits, str):
+        print(circuits)
+        return circuits
+
+    # Error detection: a vector file needs a bit for every input of every circuit
+    for gen in campaign["generators"]:
+        if gen.endswith(".tvb"):
+            reader = tvbin.openBin(gen)
+            if isinstance(reader, str):
+                return reader
+            fileWidth = reader["WIDTH"]
+            tvbin.closeBin(reader)
+            for name in circuits:
+                if circuits[name][2] > fileWidth:
+                    msg = ("CAMPAIGN ERROR: \"" + gen + "\" HAS " + str(fileWidth) + " INPUTS, \"" + name + "\" NEEDS " +
+                           str(circuits[name][2]))
+                    print(msg)
+                    return msg
+
+    jobs = makeJobs(campaign, circuits)
+    print("Running " + str(len(jobs)) + " jobs on " + str(len(circuits)) + " circuits...")
+
+    results = []
+    pool = multiprocessing.Pool(campaign["workers"], initWorker, (circuits,))
+    try:
+        for result in pool.imap_unordered(runJob, jobs):
+            results.append(result)
+            title = result[1] if result[1].endswith(".tvb") else "TV_" + result[1]
+            print("[" + str(len(results)) + "/" + str(len(jobs)) + "] " + result[0] + " " + title +
+                  " batch size " + str(result[2]) + ": " + str(result[4]) + "%")
+    finally:
+        pool.close()
+        pool.join()
+
+    results.sort(key=lambda result: (result[0], result[1], result[2]))
+    indexFile = open(os.path.join(campaign["output"], "index.csv"), "w")
+    writer = csv.writer(indexFile)
+    writer.writerow(["Circuit", "Generator", "Batch size", "Vectors", "Coverage (%)", "CSV", "Plot", "Seconds"])
+    writer.writerows(results)
+    indexFile.close()
+
+    return results
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Main Function
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python campaign.py campaign.json")
+        return
+
+    campaign = readCampaign(sys.argv[1])
+    if isinstance(campaign, str):
+        print(campaign)
+        return
+
+    if isinstance(runCampaign(campaign), str):
+        return
+    print("\nDone. Summary: " + os.path.join(campaign["output"], "index.csv"))
+
+
+if __name__ == "__main__":
+    main()
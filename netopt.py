@@ -0,0 +1,400 @@
+from __future__ import print_function
+
+import bitsim
+
+# Structural netlist optimization, run on the circuit from netRead before simulating it.
+#
+# One pass over the gates in topological order resolves every net to a literal: a surviving net plus an inversion
+# flag, or a constant. That takes care of buffer and inverter chains, constants (from the constants argument, e.g.
+# a stuck line), duplicate and complementary gate inputs, NOT gates feeding a gate (De Morgan when every input is
+# inverted) and duplicate gates (structural hashing). After dead gates are removed, a NOT whose driver has no other
+# fanout is absorbed into the driver by flipping its polarity (AND -> NAND, ...).
+#
+# Primary inputs and outputs keep their names, so the optimized circuit takes the same test vectors. NET_MAP says
+# what every original net became, and mapFault moves an f_list.txt fault onto the optimized circuit when that is an
+# exact equivalence, or returns None when the fault has to be simulated on the original circuit. The good values
+# those faults need come from the optimized circuit's good simulation through NET_MAP (originalGood), so only the
+# nets the optimized circuit dropped are simulated again.
+#
+# Function List:
+# 0. reduceGate: simplifies one gate whose inputs are already resolved to literals
+# 1. optimizeCircuit: runs the whole optimization pass
+# 2. chainDown: the nets that are just buffered/inverted copies of a net in the original circuit
+# 3. sameReach: checks a line reaches the same gates in the original and optimized circuit
+# 4. mapFault: moves one fault from the original circuit onto the optimized one
+# 5. goodPlan: where every net of the original compiled circuit gets its good value from
+# 6. originalGood: good values of the original circuit made from the optimized circuit's good values
+
+# gate -> (AND/OR/XOR family, output inverted)
+FAMILY = {"AND": ("AND", 0), "NAND": ("AND", 1), "OR": ("OR", 0), "NOR": ("OR", 1), "XOR": ("XOR", 0), "XNOR": ("XOR", 1)}
+# (family, output inverted) -> gate
+LOGIC = {("AND", 0): "AND", ("AND", 1): "NAND", ("OR", 0): "OR", ("OR", 1): "NOR", ("XOR", 0): "XOR", ("XOR", 1): "XNOR"}
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: simplifies an AND/OR/XOR family gate
+# lits has one (net, inverted) per input pin, a constant pin is (None, value)
+# returns ("CONST", value, None), ("LIT", (net, inverted), None) or ("GATE", (logic, literals), pins),
+# where pins[k] = (index of the literal pin k ended up in, pin value inverted) or None if pin k was dropped
+def reduceGate(family, outInv, lits):
+    final = []
+    pins = []
+
+    if family == "XOR":
+        # constants and inversions only flip the parity, inputs that appear twice cancel out
+        parity = outInv
+        for net, inv in lits:
+            if net is None:
+                parity ^= inv
+                pins.append(None)
+                continue
+            parity ^= inv
+            if net in final:
+                pins.append(final.index(net))
+            else:
+                final.append(net)
+                pins.append(len(final) - 1)
+
+        counts = [0] * len(final)
+        for k in range(len(pins)):
+            if pins[k] is not None:
+                counts[pins[k]] += 1
+        keep = [i for i in range(len(final)) if counts[i] % 2 == 1]
+        newIndex = {}
+        for i in keep:
+            newIndex[i] = len(newIndex)
+        for k in range(len(pins)):
+            if pins[k] is not None and pins[k] in newIndex:
+                # the pin's inversion is folded into the parity, so a forced pin value gets it too
+                pins[k] = (newIndex[pins[k]], lits[k][1])
+            else:
+                pins[k] = None
+        final = [final[i] for i in keep]
+
+        if len(final) == 0:
+            return ("CONST", parity, None)
+        if len(final) == 1:
+            return ("LIT", (final[0], parity), None)
+        return ("GATE", (LOGIC[("XOR", parity)], [(net, 0) for net in final]), pins)
+
+    # AND / OR: a controlling input decides the output, a non-controlling constant is dropped
+    control = 0 if family == "AND" else 1
+    for net, inv in lits:
+        if net is None:
+            if inv == control:
+                return ("CONST", control ^ outInv, None)
+            pins.append(None)
+            continue
+        if (net, inv) in final:
+            pins.append(final.index((net, inv)))
+            continue
+        # x and not x on the same gate
+        if (net, 1 - inv) in final:
+            return ("CONST", control ^ outInv, None)
+        final.append((net, inv))
+        pins.append(len(final) - 1)
+
+    if len(final) == 0:
+        return ("CONST", (1 - control) ^ outInv, None)
+    if len(final) == 1:
+        return ("LIT", (final[0][0], final[0][1] ^ outInv), None)
+
+    # every input inverted: De Morgan, AND(!a, !b) = !OR(a, b)
+    if all(inv == 1 for net, inv in final):
+        family = "OR" if family == "AND" else "AND"
+        final = [(net, 0) for net, inv in final]
+        pins = [None if pin is None else (pin, 1) for pin in pins]
+        return ("GATE", (LOGIC[(family, 1 - outInv)], final), pins)
+
+    pins = [None if pin is None else (pin, 0) for pin in pins]
+    return ("GATE", (LOGIC[(family, outInv)], final), pins)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: optimizes a netRead circuit
+# constants: {net: 0 or 1} lines tied to a value, keep: nets that must survive under their own name
+# returns a dictionary with the optimized circuit ("CIRCUIT") and the mapping back to the original
+def optimizeCircuit(circuit, constants=None, keep=None):
+    constants = constants or {}
+    compiled = bitsim.compileCircuit(circuit)
+    if isinstance(compiled, str):
+        return compiled
+
+    inputs = list(circuit["INPUTS"][1])
+    outputs = list(circuit["OUTPUTS"][1])
+    protected = set(outputs) | set(keep or [])
+
+    # flip-flops stay as they are: their outputs are free lines like inputs, their D lines have to survive
+    dffs = list(circuit.get("DFFS", ["DFF list", []])[1])
+    for x in dffs:
+        protected.add(circuit[x][1][0])
+    order = [compiled["NAMES"][out] for out, logic, fanins in compiled["GATES"]]
+
+    sig = {}        # net -> (surviving net or None for a constant, inverted / constant value)
+    invNet = {}     # net -> the kept NOT gate of that net
+    defs = {}       # kept gate -> [logic, fanins]
+    pinMap = {}     # kept gate -> per original pin: (optimized pin, inverted) or None
+    strash = {}     # (logic, fanins) -> first gate that has them
+
+    for x in inputs + dffs:
+        sig[x] = (None, constants[x]) if x in constants else (x, 0)
+
+    for gate in order:
+        logic = circuit[gate][0]
+        terms = circuit[gate][1]
+        lits = [sig[term] for term in terms]
+
+        if gate in constants:
+            result = ("CONST", constants[gate], None)
+        elif logic == "BUFF" or logic == "NOT":
+            net, inv = lits[0]
+            inv ^= 1 if logic == "NOT" else 0
+            result = ("CONST", inv, None) if net is None else ("LIT", (net, inv), None)
+        elif logic in FAMILY:
+            result = reduceGate(FAMILY[logic][0], FAMILY[logic][1], lits)
+        else:
+            msg = "LOGIC ERROR: \"" + logic + "\" IS NOT A SUPPORTED GATE"
+            print(msg)
+            return msg
+
+        if result[0] == "CONST":
+            sig[gate] = (None, result[1])
+            if gate in protected:
+                defs[gate] = ["CONST" + str(result[1]), []]
+
+        elif result[0] == "LIT":
+            net, inv = result[1]
+            if inv == 1 and net not in invNet:
+                # first inverter of this net, keep it as a real NOT gate
+                defs[gate] = ["NOT", [net]]
+                invNet[net] = gate
+                sig[gate] = (net, 1)
+            else:
+                sig[gate] = (net, inv)
+                if gate in protected:
+                    defs[gate] = ["NOT" if inv else "BUFF", [net]]
+
+        else:
+            newLogic, final = result[1]
+            # an inverted input reads the kept NOT gate of its net
+            fanins = [invNet[net] if inv else net for net, inv in final]
+            key = (newLogic, tuple(sorted(fanins)))
+            if key in strash and gate not in protected:
+                sig[gate] = (strash[key], 0)
+            else:
+                strash.setdefault(key, gate)
+                defs[gate] = [newLogic, fanins]
+                sig[gate] = (gate, 0)
+                pinMap[gate] = result[2]
+
+    # dead gate removal: only what the outputs (and kept nets) can see stays
+    live = set()
+    stack = [x for x in protected if x in defs]
+    while len(stack) > 0:
+        x = stack.pop()
+        if x in live:
+            continue
+        live.add(x)
+        stack.extend([term for term in defs[x][1] if term in defs])
+    for x in list(defs):
+        if x not in live:
+            del defs[x]
+            pinMap.pop(x, None)
+
+    fanoutCount = {}
+    for x in defs:
+        for term in defs[x][1]:
+            fanoutCount[term] = fanoutCount.get(term, 0) + 1
+
+    # inverter absorption: NOT(g) with g used nowhere else becomes g with the opposite polarity
+    pinOwner = {}
+    absorbed = {}
+    for x in order:
+        if x not in defs or defs[x][0] != "NOT":
+            continue
+        g = defs[x][1][0]
+        if g not in defs or g in protected or defs[g][0] not in FAMILY or fanoutCount.get(g, 0) != 1:
+            continue
+        family, outInv = FAMILY[defs[g][0]]
+        defs[x] = [LOGIC[(family, 1 - outInv)], defs[g][1]]
+        del defs[g]
+        absorbed[g] = x
+        if g in pinMap:
+            pinOwner[g] = x
+
+    # what every original net became, None if it can no longer be seen at any output
+    netMap = {}
+    for x in inputs + dffs + order:
+        net, inv = sig[x]
+        while net in absorbed:
+            net, inv = absorbed[net], inv ^ 1
+        if net is None:
+            netMap[x] = (None, inv)
+        elif net in defs or net in inputs or net in dffs:
+            netMap[x] = (net, inv)
+        else:
+            netMap[x] = None
+
+    newCircuit = {}
+    for x in inputs:
+        newCircuit[x] = ["INPUT", x, False, 'U']
+    for x in dffs:
+        newCircuit[x] = ["DFF", list(circuit[x][1]), False, 'U']
+    gates = []
+    for x in order:
+        if x in defs:
+            newCircuit[x] = [defs[x][0], list(defs[x][1]), False, 'U']
+            gates.append(x)
+    newCircuit["INPUT_WIDTH"] = ["input width:", len(inputs)]
+    newCircuit["INPUTS"] = ["Input list", inputs]
+    newCircuit["OUTPUTS"] = ["Output list", outputs]
+    newCircuit["GATES"] = ["Gate list", gates]
+    newCircuit["DFFS"] = ["DFF list", dffs]
+
+    # original nets grouped by the net they became
+    members = {}
+    for x in netMap:
+        if netMap[x] is not None and netMap[x][0] is not None:
+            members.setdefault(netMap[x][0], set()).add(x)
+
+    # original fanout, used to check fault equivalence
+    consumers = {}
+    for x in circuit["GATES"][1] + dffs:
+        for term in circuit[x][1]:
+            consumers.setdefault(term, set()).add(x)
+
+    opt = {}
+    opt["CIRCUIT"] = newCircuit
+    opt["ORIGINAL"] = circuit
+    opt["NET_MAP"] = netMap
+    opt["PIN_MAP"] = pinMap
+    opt["PIN_OWNER"] = pinOwner
+    opt["MEMBERS"] = members
+    opt["CONSUMERS"] = consumers
+    opt["PROTECTED"] = protected
+    return opt
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: the net itself plus every net made from it by BUFF/NOT gates only, in the original circuit
+def chainDown(opt, net):
+    circuit = opt["ORIGINAL"]
+    chain = set()
+    stack = [net]
+    while len(stack) > 0:
+        x = stack.pop()
+        if x in chain:
+            continue
+        chain.add(x)
+        for gate in opt["CONSUMERS"].get(x, []):
+            if circuit[gate][0] == "BUFF" or circuit[gate][0] == "NOT":
+                stack.append(gate)
+    return chain
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: checks that a change on a line reaches the same gates in both circuits
+# the optimized line is read by everything that became the same net, which has to be exactly what the original
+# line reaches through its buffer/inverter chain
+def sameReach(opt, net):
+    netMap = opt["NET_MAP"]
+    target = netMap[net][0]
+    chain = chainDown(opt, net)
+    group = opt["MEMBERS"][target]
+
+    for x in chain:
+        if netMap.get(x) is not None and netMap[x][0] != target:
+            return False
+    for x in group:
+        if x in chain:
+            continue
+        # nets feeding the chain are fine as long as nothing else can see them
+        if x in opt["PROTECTED"] or not opt["CONSUMERS"].get(x, set()) <= group:
+            return False
+    return True
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: the equivalent fault on the optimized circuit (split like f_list.txt), or None if there is none
+def mapFault(opt, fault):
+    netMap = opt["NET_MAP"]
+
+    if fault[1] == "SA":
+        net = "wire_" + fault[0]
+        if netMap.get(net) is None or netMap[net][0] is None:
+            return None
+        target, inv = netMap[net]
+
+        if not sameReach(opt, net):
+            return None
+        return [target[5:], "SA", str(int(fault[2]) ^ inv)]
+
+    if fault[1] == "IN":
+        gate = "wire_" + fault[0]
+        net = "wire_" + fault[2]
+
+        # on a single input gate a stuck input is the same as a stuck output
+        logic = opt["ORIGINAL"][gate][0]
+        if logic == "BUFF" or logic == "NOT":
+            value = int(fault[4]) ^ (1 if logic == "NOT" else 0)
+            return mapFault(opt, [fault[0], "SA", str(value)])
+
+        pins = opt["PIN_MAP"].get(gate)
+        owner = opt["PIN_OWNER"].get(gate, gate)
+        if pins is None or owner not in opt["CIRCUIT"] or netMap[gate] is None or netMap[gate][0] != owner:
+            return None
+
+        # a stuck input only changes the gate output, which has to reach the same lines as before
+        if not sameReach(opt, gate):
+            return None
+
+        terms = opt["ORIGINAL"][gate][1]
+        hit = [k for k in range(len(terms)) if terms[k] == net]
+        if len(hit) == 0 or pins[hit[0]] is None:
+            return None
+        newPin, inv = pins[hit[0]]
+
+        # every original pin on the optimized pin has to be the same line, otherwise the fault would hit more
+        for k in range(len(terms)):
+            if (k in hit) != (pins[k] is not None and pins[k][0] == newPin):
+                return None
+        newNet = opt["CIRCUIT"][owner][1][newPin]
+        return [owner[5:], "IN", newNet[5:], "SA", str(int(fault[4]) ^ inv)]
+
+    return None
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: plan for originalGood, from the two compiled circuits (only for an optimization without constants)
+# NETS: (original net, optimized net, inverted), CONSTANTS: (original net, value), GATES: positions of the original
+# gates that have no net left in the optimized circuit, in topological order
+def goodPlan(opt, original, optimized):
+    netMap = opt["NET_MAP"]
+    plan = {"NETS": [], "CONSTANTS": [], "GATES": []}
+    for net in range(len(original["NAMES"])):
+        literal = netMap.get(original["NAMES"][net])
+        if literal is None:
+            plan["GATES"].append(original["GATE_POS"][net])
+        elif literal[0] is None:
+            plan["CONSTANTS"].append((net, literal[1]))
+        else:
+            plan["NETS"].append((net, optimized["INDEX"][literal[0]], literal[1]))
+    plan["GATES"].sort()
+    return plan
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: bitsim good values of the original circuit from the bitsim good values of the optimized one
+def originalGood(plan, original, good, ones):
+    values = [0] * len(original["NAMES"])
+    for net, target, inv in plan["NETS"]:
+        values[net] = good[target] ^ ones if inv else good[target]
+    for net, value in plan["CONSTANTS"]:
+        values[net] = ones if value else 0
+
+    # nets that were dropped are simulated the usual way
+    gates = original["GATES"]
+    for pos in plan["GATES"]:
+        out, logic, fanins = gates[pos]
+        values[out] = bitsim.evalGate(logic, [values[term] for term in fanins], ones)
+    return values
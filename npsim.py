@@ -0,0 +1,225 @@
+from __future__ import print_function
+
+# numpy is optional, only this engine needs it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Gate-parallel NumPy simulation.
+#
+# Works on a circuit compiled by bitsim. The gates of every level are grouped by logic type and fanin count, so a
+# whole group is one gather of a (gates x fanins x words) block and one bitwise reduce, instead of one python call
+# per gate. Net values are a (nets x words) uint64 array, bit v of the packed vectors is bit v % 64 of word v // 64.
+#
+# Python ints are already word parallel, so one fault at a time is left to bitsim. detectMasks simulates a chunk of
+# faults side by side in a (nets x faults x words) array, each fault in its own column, so every gate group is one
+# numpy call for the whole chunk. That wins when there are few vectors per batch and many faults (the usual 1-10
+# vector batches); with thousands of vectors per batch the cone-limited bitsim.detectMask does less work and is
+# faster. detectMasks returns the same python int masks as bitsim.detectMask, so the engines are interchangeable.
+#
+# Function List:
+# 0. compileGroups: groups the compiled gates by level, logic and fanin count
+# 1. packWords: turns bitsim input masks into a (inputs x words) array
+# 2. evalGroup: evaluates one gate group for every packed vector
+# 3. simulate: good-machine simulation of all the packed vectors
+# 4. toMask: turns a row of words back into a python int mask
+# 5. detectMasks: bit masks of the vectors that detect each of many faults, simulated side by side
+# 6. originalGood: good values of the original circuit made from the optimized circuit's (netopt.goodPlan)
+
+# reduce used by each gate type, and if the result is inverted
+REDUCE = {}
+if np is not None:
+    REDUCE = {
+        "AND": (np.bitwise_and, False), "NAND": (np.bitwise_and, True),
+        "OR": (np.bitwise_or, False), "NOR": (np.bitwise_or, True),
+        "XOR": (np.bitwise_xor, False), "XNOR": (np.bitwise_xor, True),
+        "BUFF": (np.bitwise_or, False), "NOT": (np.bitwise_or, True),
+        "CONST0": (np.bitwise_or, False), "CONST1": (np.bitwise_or, True),
+    }
+
+# most uint64 words detectMasks keeps in its (nets x faults x words) array, 32 MB
+CHUNK_WORDS = 1 << 22
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: builds the gate groups of a bitsim compiled circuit
+def compileGroups(compiled):
+    if np is None:
+        msg = "ENGINE ERROR: THE NUMPY ENGINE NEEDS NUMPY INSTALLED"
+        print(msg + "\n")
+        return msg
+
+    gates = compiled["GATES"]
+    level = compiled["LEVEL"]
+
+    # (level, logic, fanin count) -> gate positions, kept in topological order
+    groupPos = {}
+    for pos in range(len(gates)):
+        out, logic, fanins = gates[pos]
+        if logic not in REDUCE:
+            msg = "LOGIC ERROR: \"" + logic + "\" IS NOT A SUPPORTED GATE"
+            print(msg)
+            return msg
+        key = (level[out], logic, len(fanins))
+        groupPos.setdefault(key, []).append(pos)
+
+    # groups: (logic, output nets (g,), fanin matrix (g, k)), levels: level of each group
+    groups = []
+    levels = []
+    groupOf = [0] * len(gates)
+    for key in sorted(groupPos):
+        positions = groupPos[key]
+        for pos in positions:
+            groupOf[pos] = len(groups)
+        outs = np.array([gates[pos][0] for pos in positions], dtype=np.intp)
+        fanins = np.array([gates[pos][2] for pos in positions], dtype=np.intp)
+        groups.append((key[1], outs, fanins))
+        levels.append(key[0])
+
+    state = {}
+    state["COMPILED"] = compiled
+    state["GROUPS"] = groups
+    state["LEVELS"] = levels
+    state["GROUP_OF"] = groupOf
+    state["OUTPUTS"] = np.array(compiled["OUTPUTS"], dtype=np.intp)
+    return state
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: turns python int input masks into rows of 64-bit words
+def packWords(inputMasks, count):
+    words = max(1, (count + 63) // 64)
+    rows = np.zeros((len(inputMasks), words), dtype=np.uint64)
+    for i in range(len(inputMasks)):
+        rows[i] = np.frombuffer(inputMasks[i].to_bytes(words * 8, "little"), dtype="<u8")
+    return rows
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: evaluates a whole gate group, returns a (gates x words) array (or (gates x faults x words))
+def evalGroup(values, logic, fanins):
+    reduce, invert = REDUCE[logic]
+    result = reduce.reduce(values[fanins], axis=1)
+    if invert:
+        np.invert(result, out=result)
+    return result
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: simulates every packed vector through the good circuit, returns the (nets x words) values
+def simulate(state, inputWords):
+    compiled = state["COMPILED"]
+    values = np.zeros((len(compiled["NAMES"]), inputWords.shape[1]), dtype=np.uint64)
+    values[compiled["INPUTS"]] = inputWords
+
+    # groups are sorted by level, so every fanin is ready before its group
+    for logic, outs, fanins in state["GROUPS"]:
+        values[outs] = evalGroup(values, logic, fanins)
+    return values
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: a row of words as one python int, vector 0 in the least significant bit
+def toMask(row):
+    return int.from_bytes(row.astype("<u8").tobytes(), "little")
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: simulates many bitsim faults at once, returns the mask of the vectors that detect each of them
+# every fault gets its own column of a (nets x faults x words) copy of the good values, and is forced in its column
+# right after the group that drives its site
+def detectMasks(state, faults, good, ones):
+    compiled = state["COMPILED"]
+    gates = compiled["GATES"]
+    level = compiled["LEVEL"]
+    groups = state["GROUPS"]
+    levels = state["LEVELS"]
+    outputs = state["OUTPUTS"]
+    allOnes = ~np.uint64(0)
+
+    nets, words = good.shape
+    chunkSize = max(1, CHUNK_WORDS // (nets * words))
+
+    # faults close in the circuit share a chunk, so the groups before the chunk's first site can be skipped
+    site = []
+    for fault in faults:
+        site.append(fault[1] if fault[0] == "SA" else gates[fault[1]][0])
+    order = sorted(range(len(faults)), key=lambda f: level[site[f]])
+
+    masks = [0] * len(faults)
+    for start in range(0, len(order), chunkSize):
+        chunk = order[start:start + chunkSize]
+        values = np.repeat(good[:, np.newaxis, :], len(chunk), axis=1)
+
+        # fixes applied after each group: stuck nets (net, column, value), stuck pins (gate, column, pins, value)
+        netFix = {}
+        pinFix = {}
+        for col in range(len(chunk)):
+            fault = faults[chunk[col]]
+            if fault[0] == "SA":
+                stuck = allOnes if fault[2] == 1 else np.uint64(0)
+                pos = compiled["GATE_POS"].get(fault[1])
+                if pos is None:
+                    values[fault[1], col] = stuck
+                else:
+                    netFix.setdefault(state["GROUP_OF"][pos], []).append((fault[1], col, stuck))
+            else:
+                stuck = allOnes if fault[3] == 1 else np.uint64(0)
+                pinFix.setdefault(state["GROUP_OF"][fault[1]], []).append((fault[1], col, fault[2], stuck))
+
+        first = level[site[chunk[0]]]
+        for group in range(len(groups)):
+            if levels[group] < first:
+                continue
+            logic, outs, fanins = groups[group]
+            values[outs] = evalGroup(values, logic, fanins)
+
+            if group in pinFix:
+                fixes = pinFix[group]
+                faninRows = np.array([gates[pos][2] for pos, col, pins, stuck in fixes], dtype=np.intp)
+                cols = np.array([col for pos, col, pins, stuck in fixes], dtype=np.intp)
+                pinMask = np.zeros(faninRows.shape, dtype=bool)
+                for k in range(len(fixes)):
+                    pinMask[k, list(fixes[k][2])] = True
+                stuckWords = np.array([stuck for pos, col, pins, stuck in fixes], dtype=np.uint64)
+                terms = np.where(pinMask[:, :, np.newaxis], stuckWords[:, np.newaxis, np.newaxis],
+                                 values[faninRows, cols[:, np.newaxis]])
+                reduce, invert = REDUCE[logic]
+                result = reduce.reduce(terms, axis=1)
+                if invert:
+                    np.invert(result, out=result)
+                values[[gates[pos][0] for pos, col, pins, stuck in fixes], cols] = result
+
+            if group in netFix:
+                for net, col, stuck in netFix[group]:
+                    values[net, col] = stuck
+
+        # a vector detects a fault if any primary output of its column is different
+        diff = np.bitwise_or.reduce(values[outputs] ^ good[outputs][:, np.newaxis, :], axis=0)
+        for col in range(len(chunk)):
+            masks[chunk[col]] = toMask(diff[col]) & ones
+    return masks
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: numpy version of netopt.originalGood, state is the original circuit's and good the optimized one's values
+def originalGood(state, plan, good):
+    compiled = state["COMPILED"]
+    values = np.zeros((len(compiled["NAMES"]), good.shape[1]), dtype=np.uint64)
+    if len(plan["NETS"]) > 0:
+        nets, targets, invs = zip(*plan["NETS"])
+        flips = np.where(np.array(invs, dtype=bool), ~np.uint64(0), np.uint64(0))
+        values[list(nets)] = good[list(targets)] ^ flips[:, np.newaxis]
+    for net, value in plan["CONSTANTS"]:
+        values[net] = ~np.uint64(0) if value else np.uint64(0)
+
+    # nets that were dropped are simulated the usual way
+    gates = compiled["GATES"]
+    for pos in plan["GATES"]:
+        out, logic, fanins = gates[pos]
+        reduce, invert = REDUCE[logic]
+        values[out] = reduce.reduce(values[list(fanins)], axis=0)
+        if invert:
+            values[out] = ~values[out]
+    return values
@@ -3,7 +3,14 @@ import copy
 import os
 import subprocess
 import csv
+import json
+import time
 from TVgen import TestVector_A, TestVector_B, TestVector_C, TestVector_D, TestVector_E 
+from seedsearch import seedSearch, bestSeeds, writeResults
+from tvbin import textToBin, binToText
+import bitsim
+import seqsim
+import tdfsim
 
 # Function List:
 # 0. getFaults: gets the faults from the file
@@ -12,7 +19,13 @@ from TVgen import TestVector_A, TestVector_B, TestVector_C, TestVector_D, TestVe
 # 3. gateCalc: function that will work on the logic of each gate
 # 4. inputRead: function that will update the circuit dictionary made in netRead to hold the line values
 # 5. basic_sim: the actual simulation
-# 6. main: The main function
+# 6. saveCheckpoint: saves the state of a fault coverage run so it can be resumed
+# 7. loadCheckpoint: loads a saved fault coverage checkpoint
+# 8. progress: formats the speed and ETA of a fault coverage run
+# 9. readVectors: reads the seed and the test vectors of a TV file
+# 10. seqFaultCoverage: fault coverage simulation of a sequential (DFF) circuit
+# 11. tdfFaultCoverage: transition fault coverage simulation with consecutive vectors as launch/capture pairs
+# 12. main: The main function
 
 #gets all of the faults from the file
 def getFaults(faultFile):
@@ -40,6 +53,26 @@ def getFaults(faultFile):
     inFile.close()
     return faults
 
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: generates every stuck-at fault of the circuit and prints them to a file
+# each line gets SA-0 and SA-1, each gate input pin gets IN faults, in the same order as netRead
+# (flip-flop outputs come right after the inputs)
+def genFaultList(circuit, faultFile):
+    outFile = open(faultFile, "w")
+
+    for x in circuit["INPUTS"][1] + circuit["DFFS"][1]:
+        outFile.write(x[5:] + "-SA-0\n")
+        outFile.write(x[5:] + "-SA-1\n")
+
+    for x in circuit["GATES"][1]:
+        outFile.write(x[5:] + "-SA-0\n")
+        outFile.write(x[5:] + "-SA-1\n")
+        for term in circuit[x][1]:
+            outFile.write(x[5:] + "-IN-" + term[5:] + "-SA-0\n")
+            outFile.write(x[5:] + "-IN-" + term[5:] + "-SA-1\n")
+
+    outFile.close()
+
 # -------------------------------------------------------------------------------------------------------------------- #
 # FUNCTION: Neatly prints the Circuit Dictionary:
 def printCkt (circuit):
@@ -70,6 +103,7 @@ def netRead(netName):
     inputs = []     # array of the input wires
     outputs = []    # array of the output wires
     gates = []      # array of the gate list
+    dffs = []       # array of the flip-flop output wires (sequential circuits only)
     inputBits = 0   # the number of inputs needed in this given circuit
 
 
@@ -146,9 +180,6 @@ def netRead(netName):
             print(msg+"\n")
             return msg
 
-        # Appending the dest name to the gate list
-        gates.append(gateOut)
-
         lineSpliced = lineSpliced[1].split("(") # splicing the line again at the "("  to get the gate logic
         logic = lineSpliced[0].upper()
 
@@ -160,6 +191,13 @@ def netRead(netName):
 
         # add the gate output wire to the circuit dictionary with the dest as the key
         circuit[gateOut] = [logic, terms, False, 'U']
+
+        # Appending the dest name to the gate list, flip-flops are kept apart since their output is the state
+        # from the previous clock cycle and not a function of this cycle's inputs
+        if logic == "DFF":
+            dffs.append(gateOut)
+        else:
+            gates.append(gateOut)
         #print(gateOut)
         #print(circuit[gateOut])
 
@@ -171,6 +209,7 @@ def netRead(netName):
     circuit["INPUTS"] = ["Input list", inputs]
     circuit["OUTPUTS"] = ["Output list", outputs]
     circuit["GATES"] = ["Gate list", gates]
+    circuit["DFFS"] = ["DFF list", dffs]
 
     #print("\n bookkeeping items in circuit: \n")
     #print(circuit["INPUT_WIDTH"])
@@ -413,6 +452,188 @@ def basic_sim(circuit):
     return circuit
 
 
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: saves a fault coverage checkpoint
+# the detected flags of each TV file are stored as one hex bitset (bit k = fault k in f_list.txt)
+def saveCheckpoint(fileName, batch, batchSize, seedVal, faults, totalDetected, inputFiles):
+    detected = []
+    for fileIndex in range(5):
+        bits = 0
+        for k in range(len(faults)):
+            if faults[k][fileIndex]:
+                bits |= 1 << k
+        detected.append(format(bits, "x"))
+
+    state = {}
+    state["batch"] = batch
+    state["batchSize"] = batchSize
+    state["seed"] = seedVal
+    state["totalFaults"] = len(faults)
+    state["totalDetected"] = totalDetected
+    state["detected"] = detected
+    state["offsets"] = [x.tell() for x in inputFiles]
+    state["sizes"] = [os.fstat(x.fileno()).st_size for x in inputFiles]
+
+    # write to a temporary file first so a kill while saving never leaves a broken checkpoint
+    outFile = open(fileName + ".tmp", "w")
+    json.dump(state, outFile)
+    outFile.flush()
+    os.fsync(outFile.fileno())
+    outFile.close()
+    os.replace(fileName + ".tmp", fileName)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: loads a fault coverage checkpoint and puts the detected flags back into the faults list
+# the TV files and f_cvg.csv have to still be the ones the checkpoint was made with
+# returns the checkpoint dictionary, or None if there is no usable checkpoint
+def loadCheckpoint(fileName, faults):
+    if not os.path.isfile(fileName):
+        return None
+
+    inFile = open(fileName, "r")
+    try:
+        state = json.load(inFile)
+    except ValueError:
+        print("CHECKPOINT ERROR: \"" + fileName + "\" IS NOT A VALID CHECKPOINT")
+        return None
+    finally:
+        inFile.close()
+
+    # Error detection: checkpoint was made for a different fault list
+    if state["totalFaults"] != len(faults):
+        print("CHECKPOINT ERROR: \"" + fileName + "\" DOES NOT MATCH f_list.txt")
+        return None
+
+    # Error detection: the TV files were generated again (other seed or width) since the checkpoint
+    for fileIndex in range(5):
+        tvName = "TV_" + "ABCDE"[fileIndex] + ".txt"
+        tvFile = open(tvName, "r")
+        seedLine = tvFile.readline()
+        tvFile.close()
+        seedVal = format(int(seedLine.replace("#seed: ", "")), "08b")
+        if seedVal != state["seed"] or os.path.getsize(tvName) != state["sizes"][fileIndex]:
+            print("CHECKPOINT ERROR: \"" + fileName + "\" DOES NOT MATCH " + tvName)
+            return None
+
+    # Error detection: f_cvg.csv has to hold the header and every batch before the checkpoint
+    csvFile = open("f_cvg.csv", "r") if os.path.isfile("f_cvg.csv") else None
+    rows = list(csv.reader(csvFile)) if csvFile is not None else []
+    if csvFile is not None:
+        csvFile.close()
+    header = ["seed = " + state["seed"], "batch size = " + str(state["batchSize"])]
+    if len(rows) < state["batch"] + 1 or rows[0][6:8] != header:
+        print("CHECKPOINT ERROR: \"" + fileName + "\" DOES NOT MATCH f_cvg.csv")
+        return None
+
+    for fileIndex in range(5):
+        bits = int(state["detected"][fileIndex], 16)
+        for k in range(len(faults)):
+            faults[k][fileIndex] = bool((bits >> k) & 1)
+
+    return state
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: speed and estimated time left of a fault coverage run, as one line of text
+def progress(startTime, batchesDone, batchesLeft, vectorsDone, faultSims):
+    elapsed = max(time.time() - startTime, 1e-9)
+    eta = int(elapsed / max(batchesDone, 1) * batchesLeft)
+    return "{:.1f} vectors/s, {:.0f} faults/s, ETA {:d}:{:02d}:{:02d}".format(
+        vectorsDone / elapsed, faultSims / elapsed, eta // 3600, (eta // 60) % 60, eta % 60)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: seed ("#seed: " line) and vector lines of a TV file, each vector cut to the circuit's input width
+def readVectors(fileName, width):
+    seedVal = ""
+    vectors = []
+    inFile = open(fileName, "r")
+    for line in inFile:
+        line = line.replace("\n", "").replace(" ", "")
+        if line == "":
+            continue
+        if line[0] == "#":
+            seedVal = line.replace("#seed:", "")
+            continue
+        vectors.append(line[(len(line) - width):])
+    inFile.close()
+    return seedVal, vectors
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: fault coverage of a sequential circuit, every TV file is applied as one long sequence of clock cycles
+def seqFaultCoverage(circuit, faults, batchSize):
+    compiled = bitsim.compileCircuit(circuit)
+    if isinstance(compiled, str):
+        return compiled
+
+    parsed = []
+    for faultLine in faults:
+        fault = bitsim.parseFault(compiled, faultLine[5])
+        if isinstance(fault, str):
+            print(fault)
+            return fault
+        parsed.append(fault)
+
+    columns = []
+    seedVal = ""
+    for gen in ["A", "B", "C", "D", "E"]:
+        print("TV_" + gen + "...", end = "")
+        seedVal, vectors = readVectors("TV_" + gen + ".txt", circuit["INPUT_WIDTH"][1])
+        columns.append(seqsim.seqCoverage(compiled, parsed, vectors, batchSize))
+        print("done")
+
+    csvFile = open("f_cvg.csv", "w")
+    writer = csv.writer(csvFile)
+    writer.writerow(["Batch #", "A", "B", "C", "D", "E", "seed = " + format(int(seedVal), "08b"), "batch size = " + str(batchSize)])
+    for batch in range(25):
+        writer.writerow([batch + 1] + [column[batch] for column in columns])
+    csvFile.close()
+
+    print("\nDone.")
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: transition fault coverage, pairs of consecutive vectors of every TV file launch and capture the transitions
+def tdfFaultCoverage(circuit, faultFile, batchSize):
+    # Error detection: consecutive vectors are only launch/capture pairs when nothing is clocked in between
+    if len(circuit["DFFS"][1]) > 0:
+        msg = "TRANSITION ERROR: SEQUENTIAL CIRCUITS ARE NOT SUPPORTED"
+        print(msg + "\n")
+        return msg
+
+    compiled = bitsim.compileCircuit(circuit)
+    if isinstance(compiled, str):
+        return compiled
+
+    tdfsim.genTransitionList(circuit, faultFile)
+    parsed = []
+    for faultLine in getFaults(faultFile):
+        fault = tdfsim.parseTransition(compiled, faultLine[5])
+        if isinstance(fault, str):
+            print(fault)
+            return fault
+        parsed.append(fault)
+
+    columns = []
+    seedVal = ""
+    for gen in ["A", "B", "C", "D", "E"]:
+        print("TV_" + gen + "...", end = "")
+        seedVal, vectors = readVectors("TV_" + gen + ".txt", circuit["INPUT_WIDTH"][1])
+        columns.append(tdfsim.tdfCoverage(compiled, parsed, vectors, batchSize))
+        print("done")
+
+    csvFile = open("tdf_cvg.csv", "w")
+    writer = csv.writer(csvFile)
+    writer.writerow(["Batch #", "A", "B", "C", "D", "E", "seed = " + format(int(seedVal), "08b"), "batch size = " + str(batchSize)])
+    for batch in range(25):
+        writer.writerow([batch + 1] + [column[batch] for column in columns])
+    csvFile.close()
+
+    print("\nDone.")
+
+
 def plot():
     plotProcess = subprocess.Popen("gnuplot p2plot.gpl", shell = True)
     os.waitpid(plotProcess.pid, 0)
@@ -433,16 +654,19 @@ def main():
     #gets user choice
     while True:
         userChoice = 0
-        print("\nChoose what you would like to do (1 or 2): \n")
+        print("\nChoose what you would like to do (1 - 5): \n")
         print("1: Test Vector Generation\n")
         print("2: Fault Coverage Simulation\n")
+        print("3: Seed Search\n")
+        print("4: Test Vector File Conversion\n")
+        print("5: Transition Fault Coverage Simulation\n")
         userInput = input()
         if userInput =="":
             print("\nPlease Enter a value\n")
             break
         else: 
             userChoice = int(userInput)
-            if(userChoice >= 1 & userChoice <= 2):
+            if(userChoice >= 1 and userChoice <= 5):
                 break
             else:
                 print("\nChoice not valid. Please enter a valid choice.\n")
@@ -489,8 +713,27 @@ def main():
 
     elif(userChoice == 2):
 
+        #gets the faults that need to be tested
+        faults = getFaults("f_list.txt")
+
+        #sequential circuits are clocked with one vector per cycle by seqsim
+        sequential = len(circuit["DFFS"][1]) > 0
+
+        #offers to continue a run that was stopped before it finished
+        checkpoint = None
+        if not sequential:
+            checkpoint = loadCheckpoint("f_cvg.ckpt", faults)
+        if checkpoint is not None:
+            print("\nOption 2: Fault Coverage Simulation.")
+            print("Found a checkpoint after batch " + str(checkpoint["batch"]) + " with batch size " + str(checkpoint["batchSize"]) + ". Resume? (y/n): ", end = "")
+            if input().strip().lower() != "y":
+                #the new run starts over, so the old checkpoint must not be resumed later
+                os.remove("f_cvg.ckpt")
+                checkpoint = None
+                faults = getFaults("f_list.txt")
+
         #get batch size
-        while True:
+        while checkpoint is None:
             print("\nOption 2: Fault Coverage Simulation.")
             batchSize = 1
             print("Choose a batch size in [1, 10]: ", end = "")
@@ -504,10 +747,6 @@ def main():
                 else:
                     print("\nERROR: not a valid integer\n")
 
-
-        #gets the faults that need to be tested
-        faults = getFaults("f_list.txt")
-
         print("\ninput files: circ.bench, f_list.txt, TV_A.txt, TV_B.txt, TV_C.txt, TV_D.txt, TV_E.txt")
         print("output file: f_cvg.csv")
 
@@ -515,6 +754,11 @@ def main():
         # Note: UI code;
         # **************************************************************************************************************** #
 
+        if sequential:
+            seqFaultCoverage(circuit, faults, batchSize)
+            plot()
+            return
+
         inputFiles = []
         inputFiles.append(open("TV_A.txt", "r"))
         inputFiles.append(open("TV_B.txt", "r"))
@@ -522,24 +766,54 @@ def main():
         inputFiles.append(open("TV_D.txt", "r"))
         inputFiles.append(open("TV_E.txt", "r"))
 
-        #get seed value and moves the file cursor to the second line
-        seedVal = ""
-        for x in inputFiles:
-            seedVal = x.readline()
+        totalFaults = len(faults)
 
-        seedVal = seedVal.replace("#seed: ", "")
-        seedVal = format(int(seedVal), "08b")
+        if checkpoint is None:
+            #get seed value and moves the file cursor to the second line
+            seedVal = ""
+            for x in inputFiles:
+                seedVal = x.readline()
 
-        totalFaults = len(faults)
-        totalDetected = [0, 0, 0, 0, 0]
+            seedVal = seedVal.replace("#seed: ", "")
+            seedVal = format(int(seedVal), "08b")
+
+            firstBatch = 0
+            totalDetected = [0, 0, 0, 0, 0]
 
-        csvFile = open("f_cvg.csv", "w")
+            #a checkpoint that did not match is stale now that f_cvg.csv is written again
+            if os.path.isfile("f_cvg.ckpt"):
+                os.remove("f_cvg.ckpt")
 
-        writer = csv.writer(csvFile)
-        writer.writerow(["Batch #", "A", "B", "C", "D", "E", "seed = " + seedVal, "batch size = " + str(batchSize)])
+            csvFile = open("f_cvg.csv", "w")
+
+            writer = csv.writer(csvFile)
+            writer.writerow(["Batch #", "A", "B", "C", "D", "E", "seed = " + seedVal, "batch size = " + str(batchSize)])
+        else:
+            #puts every file cursor back where the checkpoint left it
+            for fileIndex in range(5):
+                inputFiles[fileIndex].seek(checkpoint["offsets"][fileIndex])
+
+            seedVal = checkpoint["seed"]
+            batchSize = checkpoint["batchSize"]
+            firstBatch = checkpoint["batch"]
+            totalDetected = checkpoint["totalDetected"]
+
+            #keeps only the rows that were written before the checkpoint
+            csvFile = open("f_cvg.csv", "r")
+            rows = list(csv.reader(csvFile))[0:firstBatch + 1]
+            csvFile.close()
+
+            csvFile = open("f_cvg.csv", "w")
+            writer = csv.writer(csvFile)
+            writer.writerows(rows)
+            print("Resuming after batch " + str(firstBatch) + "\n")
+
+        startTime = time.time()
+        vectorsDone = 0
+        faultSims = 0
 
         # Runs the simulator for each line of the input file
-        for batch in range(25):
+        for batch in range(firstBatch, 25):
             print("Batch: " + str(batch +1) + "...", end = "")
             for fileIndex in range(5):
                 for _ in range(batchSize):
@@ -580,6 +854,7 @@ def main():
 
 
                     circuit = basic_sim(circuit)
+                    vectorsDone += 1
 
                     for y in circuit["OUTPUTS"][1]:
                         if not circuit[y][2]:
@@ -594,6 +869,7 @@ def main():
 
                         #creates a copy of the circuit to be used for fault testing
                         faultCircuit = copy.deepcopy(circuit)
+                        faultSims += 1
 
                         for key in faultCircuit:
                             if (key[0:5]=="wire_"):
@@ -646,16 +922,108 @@ def main():
                             circuit[key][3] = 'U'
 
             writer.writerow([batch + 1, totalDetected[0]/totalFaults*100, totalDetected[1]/totalFaults*100, totalDetected[2]/totalFaults*100, totalDetected[3]/totalFaults*100, totalDetected[4]/totalFaults*100])
-            print("done")
+            csvFile.flush()
+
+            #the row is on disk, so the checkpoint can move past this batch
+            saveCheckpoint("f_cvg.ckpt", batch + 1, batchSize, seedVal, faults, totalDetected, inputFiles)
+            print("done  (" + progress(startTime, batch + 1 - firstBatch, 24 - batch, vectorsDone, faultSims) + ")")
 
         for x in inputFiles:
             x.close()
         csvFile.close()
 
+        #the run finished, nothing left to resume
+        os.remove("f_cvg.ckpt")
+
         print("\nDone.")
         
         plot()
 
+    elif(userChoice == 3):
+
+        #get target coverage
+        while True:
+            print("\nOption 3: Seed Search.")
+            target = 90.0
+            print("Choose a target fault coverage % in (0, 100]: ", end = "")
+            userInput = input()
+            if userInput =="":
+                print("\nERROR: please enter a target coverage\n")
+            else:
+                target = float(userInput)
+                if(target > 0 and target <= 100):
+                    break
+                else:
+                    print("\nERROR: Value not within range.\n")
+
+        faults = getFaults("f_list.txt")
+
+        print("\ninput files: circ.bench, f_list.txt")
+        print("output file: seed_search.csv")
+
+        print("\nProcessing seeds 1-255 for TV_A to TV_E...", end = "")
+        results = seedSearch(circuit, [x[5] for x in faults], ["A", "B", "C", "D", "E"], range(1, 256), target)
+        if isinstance(results, str):
+            return
+        writeResults("seed_search.csv", results, target)
+        print("done\n")
+
+        best, overall = bestSeeds(results)
+        for gen in sorted(best):
+            if best[gen][2] == -1:
+                print("TV_" + gen + ": seed " + str(best[gen][1]) + " never reaches target, best coverage " + str(best[gen][3]) + "%")
+            else:
+                print("TV_" + gen + ": seed " + str(best[gen][1]) + " reaches target in " + str(best[gen][2]) + " vectors")
+        print("\nBest: TV_" + overall[0] + " with seed " + str(overall[1]))
+
+        print("\nDone.")
+
+    elif(userChoice == 4):
+
+        #get conversion direction
+        while True:
+            print("\nOption 4: Test Vector File Conversion.")
+            print("1: text to packed binary (TV_*.txt -> TV_*.tvb)")
+            print("2: packed binary to text (TV_*.tvb -> TV_*.txt)")
+            userInput = input()
+            if userInput == "1" or userInput == "2":
+                break
+            print("\nERROR: Choice not valid.\n")
+
+        print("\nProcessing...\n")
+        for gen in ["A", "B", "C", "D", "E"]:
+            print("TV_" + gen + "...", end = "")
+            if userInput == "1":
+                textToBin("TV_" + gen + ".txt", "TV_" + gen + ".tvb", gen, circuit["INPUT_WIDTH"][1])
+            else:
+                binToText("TV_" + gen + ".tvb", "TV_" + gen + ".txt")
+            print("done")
+
+        print("\nDone.")
+
+    elif(userChoice == 5):
+
+        #get batch size
+        while True:
+            print("\nOption 5: Transition Fault Coverage Simulation.")
+            batchSize = 1
+            print("Choose a batch size in [1, 10]: ", end = "")
+            userInput = input()
+            if userInput =="":
+                print("\nERROR: please enter a batch size\n")
+            else:
+                batchSize = int(userInput)
+                if(batchSize >= 1 and batchSize <= 10):
+                    break
+                else:
+                    print("\nERROR: not a valid integer\n")
+
+        print("\ninput files: circ.bench, TV_A.txt, TV_B.txt, TV_C.txt, TV_D.txt, TV_E.txt")
+        print("output files: tdf_list.txt, tdf_cvg.csv")
+
+        print("\nProcessing...\n")
+        tdfFaultCoverage(circuit, "tdf_list.txt", batchSize)
+
 
 if __name__ == "__main__":
     main()
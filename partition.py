@@ -0,0 +1,224 @@
+from __future__ import print_function
+import multiprocessing
+import sys
+
+import bitsim
+from p2sim import netRead, getFaults, readVectors
+
+# Output cone partitioning, a diagnostic tool.
+#
+# A fault can only be seen at the primary outputs whose input cone holds the fault site. The circuit is split into
+# the input cones of its outputs (optionally clustered together up to a gate budget), every fault goes to the
+# union of the cones of exactly the outputs that can see it, and is fault simulated on that sub-netlist only.
+# Every partition is an independent job, so partitions are handed out to a pool of worker processes.
+#
+# Sub-netlists keep every primary input, so test vectors apply to them unchanged.
+#
+# This is not a faster way to get fault coverage: bitsim.detectMask already only simulates the fault's fanout cone,
+# and every partition is compiled and good-simulated again. It is for looking at how the faults of a circuit split
+# over its outputs (partition sizes, faults per partition, unobservable faults), checked against one TV file. Batch
+# coverage csvs come from p2sim option 2 and campaign.py.
+#
+# Usage: python partition.py circ.bench f_list.txt TV_A.txt [max gates per partition]
+#
+# Function List:
+# 0. outputCones: the gates in the input cone of every primary output
+# 1. clusterCones: groups output cones into partitions, up to a gate budget
+# 2. subCircuit: builds the netRead style circuit of one partition
+# 3. assignFaults: gives every fault the smallest partition that can see all of its effects
+# 4. simPartition: fault simulates the faults of one partition (worker job)
+# 5. partitionFaultSim: runs every partition on the worker pool
+# 6. main: The main function
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: {output: set of gates in its input cone (the output included)}
+def outputCones(circuit):
+    cones = {}
+    for out in circuit["OUTPUTS"][1]:
+        cone = set()
+        stack = [out]
+        while len(stack) > 0:
+            x = stack.pop()
+            # inputs are in every partition already
+            if x in cone or circuit[x][0] == "INPUT":
+                continue
+            cone.add(x)
+            stack.extend(circuit[x][1])
+        cones[out] = cone
+    return cones
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: groups the output cones into partitions [(outputs, gates)]
+# with no budget every output is its own partition, otherwise cones are merged into the partition they share the
+# most gates with as long as it stays within maxGates
+def clusterCones(cones, maxGates=None):
+    partitions = []
+    for out in sorted(cones, key=lambda x: -len(cones[x])):
+        cone = cones[out]
+        best = None
+        if maxGates is not None:
+            for part in partitions:
+                union = len(part[1] | cone)
+                if union > maxGates:
+                    continue
+                overlap = len(part[1] & cone)
+                if best is None or overlap > best[0]:
+                    best = (overlap, part)
+
+        if best is None:
+            partitions.append(([out], set(cone)))
+        else:
+            best[1][0].append(out)
+            best[1][1].update(cone)
+    return partitions
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: circuit dictionary with only the gates of one partition
+def subCircuit(circuit, outputs, gates):
+    sub = {}
+    for x in circuit["INPUTS"][1]:
+        sub[x] = list(circuit[x])
+    order = [x for x in circuit["GATES"][1] if x in gates]
+    for x in order:
+        sub[x] = [circuit[x][0], list(circuit[x][1]), False, 'U']
+
+    sub["INPUT_WIDTH"] = list(circuit["INPUT_WIDTH"])
+    sub["INPUTS"] = ["Input list", list(circuit["INPUTS"][1])]
+    sub["OUTPUTS"] = ["Output list", [x for x in circuit["OUTPUTS"][1] if x in outputs]]
+    sub["GATES"] = ["Gate list", order]
+    return sub
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: partition index for every fault, None for faults no output can see
+# a fault goes to the union of the cones of exactly the outputs that can see it, an existing partition is reused
+# only when it has that same gate set, so each fault gets the smallest sub-netlist that is exact for it
+def assignFaults(circuit, cones, partitions, faultLines):
+    # the outputs that can see each line
+    seenBy = {}
+    for out in cones:
+        seenBy.setdefault(out, set()).add(out)
+        for x in cones[out]:
+            seenBy.setdefault(x, set()).add(out)
+            for term in circuit[x][1]:
+                if circuit[term][0] == "INPUT":
+                    seenBy.setdefault(term, set()).add(out)
+
+    # output set -> partition index
+    byOutputs = {}
+    assigned = []
+    for fault in faultLines:
+        # a stuck gate input only changes that gate's output
+        site = "wire_" + fault[0]
+        outs = frozenset(seenBy.get(site, set()))
+        if len(outs) == 0:
+            assigned.append(None)
+            continue
+
+        if outs not in byOutputs:
+            gates = set()
+            for out in outs:
+                gates |= cones[out]
+
+            # a partition holding all these outputs and no more gates is the same sub-netlist
+            found = None
+            for p in range(len(partitions)):
+                if len(partitions[p][1]) == len(gates) and outs <= set(partitions[p][0]):
+                    found = p
+                    break
+            if found is None:
+                partitions.append(([out for out in cones if out in outs], gates))
+                found = len(partitions) - 1
+            byOutputs[outs] = found
+        assigned.append(byOutputs[outs])
+    return assigned
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: fault simulates one partition, job = (sub circuit, [(fault number, split fault)], vectors)
+# returns [(fault number, detection mask)]
+def simPartition(job):
+    sub, faults, vectors = job
+    compiled = bitsim.compileCircuit(sub)
+    ones = (1 << len(vectors)) - 1
+    good = bitsim.simulate(compiled, bitsim.packVectors(vectors, sub["INPUT_WIDTH"][1]), ones)
+
+    masks = []
+    for number, line in faults:
+        masks.append((number, bitsim.detectMask(compiled, bitsim.parseFault(compiled, line), good, ones)))
+    return masks
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: detection mask of every fault, simulated per partition on a worker pool
+def partitionFaultSim(circuit, faultLines, vectors, maxGates=None, workers=None):
+    # Error detection: a flip-flop carries a fault into later cycles, so output cones are not independent
+    if len(circuit.get("DFFS", ["DFF list", []])[1]) > 0:
+        msg = "PARTITION ERROR: SEQUENTIAL CIRCUITS CAN NOT BE SPLIT INTO OUTPUT CONES"
+        print(msg + "\n")
+        return msg
+    cones = outputCones(circuit)
+    partitions = clusterCones(cones, maxGates)
+    assigned = assignFaults(circuit, cones, partitions, faultLines)
+
+    jobs = []
+    for p in range(len(partitions)):
+        faults = [(k, faultLines[k]) for k in range(len(faultLines)) if assigned[k] == p]
+        if len(faults) > 0:
+            jobs.append((subCircuit(circuit, partitions[p][0], partitions[p][1]), faults, vectors))
+    # biggest partitions first
+    jobs.sort(key=lambda job: -len(job[0]["GATES"][1]) * len(job[1]))
+
+    masks = [0] * len(faultLines)
+    if workers == 1:
+        results = [simPartition(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(simPartition, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    for result in results:
+        for number, mask in result:
+            masks[number] = mask
+    return masks, partitions, assigned
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Main Function
+def main():
+    if len(sys.argv) < 4:
+        print("Usage: python partition.py circ.bench f_list.txt TV_A.txt [max gates per partition]")
+        return
+    maxGates = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    circuit = netRead(sys.argv[1])
+    if isinstance(circuit, str):
+        return
+    faultLines = [x[5] for x in getFaults(sys.argv[2])]
+
+    seedVal, vectors = readVectors(sys.argv[3], circuit["INPUT_WIDTH"][1])
+
+    result = partitionFaultSim(circuit, faultLines, vectors, maxGates)
+    if isinstance(result, str):
+        return
+    masks, partitions, assigned = result
+
+    print("\n" + str(len(circuit["GATES"][1])) + " gates, " + str(len(partitions)) + " partitions:")
+    for p in range(len(partitions)):
+        outs = ", ".join([x[5:] for x in partitions[p][0]])
+        print("  " + str(p) + ": " + str(len(partitions[p][1])) + " gates, " + str(assigned.count(p)) +
+              " faults, outputs " + outs)
+    print("  unobservable faults: " + str(assigned.count(None)))
+
+    detected = len([mask for mask in masks if mask])
+    print("\nFault coverage: " + str(detected / len(faultLines) * 100) + "% with " + str(len(vectors)) + " vectors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+from __future__ import print_function
+import csv
+import math
+import multiprocessing
+
+import bitsim
+import seqsim
+from TVgen import GENERATORS
+
+# Seed search: finds the TVgen seed for each generator (A-E) that reaches a target fault coverage in the fewest
+# test vectors. Every seed/generator pair is an independent job, so they are spread over a pool of worker
+# processes. The circuit is compiled and the faults are parsed once, then handed to every worker when it starts.
+# Sequential circuits are clocked through seqsim, one vector per cycle from reset.
+#
+# Function List:
+# 0. initWorker: stores the shared precompiled circuit and faults in the worker process
+# 1. evalSeed: fault simulates one generator/seed pair until the target coverage is reached
+# 2. seedSearch: runs evalSeed for every generator/seed pair on a worker pool
+# 3. bestSeeds: picks the best seed for each generator and overall
+# 4. writeResults: writes every result to a csv file
+
+# shared state of a worker process, filled in by initWorker
+workerState = {}
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: keeps the precompiled circuit and parsed faults around for every job this worker runs
+def initWorker(compiled, faults, width):
+    workerState["compiled"] = compiled
+    workerState["faults"] = faults
+    workerState["width"] = width
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: evaluates one (generator, seed, target %, chunk size) job
+# returns (generator, seed, vectors needed to reach the target or -1, final coverage %)
+def evalSeed(job):
+    gen, seed, target, chunkSize = job
+    compiled = workerState["compiled"]
+    faults = workerState["faults"]
+    width = workerState["width"]
+
+    vectors = GENERATORS[gen](width, seed)
+    totalFaults = len(faults)
+    needed = int(math.ceil(target / 100.0 * totalFaults))
+
+    active = list(range(totalFaults))   # faults that have not been detected yet
+    firsts = []                         # index of the first vector that detected each detected fault
+    vectorsNeeded = -1
+
+    # sequential circuits: the vectors are one sequence of clock cycles, so there are no independent chunks
+    if len(compiled["DFFS"]) > 0:
+        firsts = sorted([cycle for cycle in seqsim.detectCycles(compiled, faults, vectors) if cycle != -1])
+        if len(firsts) >= needed:
+            vectorsNeeded = firsts[needed - 1] + 1
+        return (gen, seed, vectorsNeeded, len(firsts) / totalFaults * 100)
+
+    for start in range(0, len(vectors), chunkSize):
+        chunk = vectors[start:start + chunkSize]
+        ones = (1 << len(chunk)) - 1
+        good = bitsim.simulate(compiled, bitsim.packVectors(chunk, width), ones)
+
+        # detected faults are dropped, only the rest get simulated on the next chunk
+        stillActive = []
+        for f in active:
+            mask = bitsim.detectMask(compiled, faults[f], good, ones)
+            if mask:
+                firsts.append(start + bitsim.firstDetect(mask))
+            else:
+                stillActive.append(f)
+        active = stillActive
+
+        # early termination once enough faults are detected
+        if len(firsts) >= needed:
+            firsts.sort()
+            vectorsNeeded = firsts[needed - 1] + 1
+            break
+
+    return (gen, seed, vectorsNeeded, len(firsts) / totalFaults * 100)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: evaluates every generator/seed pair in parallel
+def seedSearch(circuit, faultLines, generators, seeds, target, chunkSize=32, workers=None):
+    compiled = bitsim.compileCircuit(circuit)
+    if isinstance(compiled, str):
+        return compiled
+
+    faults = []
+    for line in faultLines:
+        fault = bitsim.parseFault(compiled, line)
+        if isinstance(fault, str):
+            print(fault)
+            return fault
+        faults.append(fault)
+
+    jobs = [(gen, seed, target, chunkSize) for gen in generators for seed in seeds]
+    initArgs = (compiled, faults, circuit["INPUT_WIDTH"][1])
+
+    if workers == 1:
+        initWorker(*initArgs)
+        return [evalSeed(job) for job in jobs]
+
+    pool = multiprocessing.Pool(workers, initWorker, initArgs)
+    try:
+        results = pool.map(evalSeed, jobs, chunksize=8)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: best result for each generator plus the best overall
+# fewest vectors wins, seeds that never reach the target only win on coverage
+def bestSeeds(results):
+    def rank(result):
+        reached = result[2] != -1
+        return (not reached, result[2] if reached else 0, -result[3], result[1])
+
+    best = {}
+    for result in results:
+        gen = result[0]
+        if gen not in best or rank(result) < rank(best[gen]):
+            best[gen] = result
+
+    overall = None
+    for gen in sorted(best):
+        if overall is None or rank(best[gen]) < rank(overall):
+            overall = best[gen]
+    return best, overall
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: writes every seed search result to a csv file
+def writeResults(fileName, results, target):
+    csvFile = open(fileName, "w")
+    writer = csv.writer(csvFile)
+    writer.writerow(["Generator", "Seed", "Vectors to target", "Coverage (%)", "target = " + str(target)])
+    for result in sorted(results):
+        writer.writerow(list(result))
+    csvFile.close()
@@ -0,0 +1,147 @@
+from __future__ import print_function
+
+import bitsim
+
+# Sequential (ISCAS-89 DFF) fault simulation over a sequence of test vectors.
+#
+# The vectors are applied one per clock cycle, the flip-flop state is carried from one cycle to the next and every
+# flip-flop starts at 0. Faulty machines are simulated in parallel: in every packed value bit 0 is the good machine
+# and bit k is the machine with fault k, so one pass over the gates clocks every machine at once. A fault counts as
+# detected at the first cycle where any primary output of its machine differs from the good machine. Detected
+# machines are dropped and the rest are repacked into a narrower word once enough of them are gone.
+#
+# Function List:
+# 0. buildForces: per net and per gate pin masks that inject the faults of a group of machines
+# 1. clockCycle: simulates one clock cycle of every packed machine
+# 2. repack: moves the flip-flop state of the machines still running into a new packing
+# 3. detectCycles: first detecting cycle of every fault over a vector sequence
+# 4. seqCoverage: fault coverage after every batch of a vector sequence, in the f_cvg.csv form
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: builds the fault injection masks for machines 1..len(faults)
+# netForce[net] = (lanes to clear, lanes to set), pinForce[gate position] = [(pin, lanes to clear, lanes to set)]
+def buildForces(faults):
+    netForce = {}
+    pinForce = {}
+    for k in range(len(faults)):
+        lane = 1 << (k + 1)
+        fault = faults[k]
+        if fault[0] == "SA":
+            clear, setBits = netForce.get(fault[1], (0, 0))
+            netForce[fault[1]] = (clear | lane, setBits | (lane if fault[2] == 1 else 0))
+        else:
+            for pin in fault[2]:
+                pinForce.setdefault(fault[1], []).append((pin, lane, lane if fault[3] == 1 else 0))
+    return netForce, pinForce
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: one clock cycle; vector is the input line, state the packed value of every flip-flop
+# returns (lanes whose outputs differ from the good machine, next state)
+def clockCycle(compiled, vector, state, forces, ones):
+    netForce, pinForce = forces
+    values = [0] * len(compiled["NAMES"])
+
+    # primary inputs are the same for every machine, the last character of the line is input 0
+    width = len(compiled["INPUTS"])
+    for i in compiled["INPUTS"]:
+        values[i] = ones if vector[len(vector) - 1 - i] == "1" else 0
+    for k in range(len(compiled["DFFS"])):
+        values[compiled["DFFS"][k][0]] = state[k]
+
+    for net in netForce:
+        if net < width + len(compiled["DFFS"]):
+            clear, setBits = netForce[net]
+            values[net] = (values[net] & ~clear) | setBits
+
+    for pos in range(len(compiled["GATES"])):
+        out, logic, fanins = compiled["GATES"][pos]
+        terms = [values[term] for term in fanins]
+        if pos in pinForce:
+            for pin, clear, setBits in pinForce[pos]:
+                terms[pin] = (terms[pin] & ~clear) | setBits
+        value = bitsim.evalGate(logic, terms, ones)
+        if out in netForce:
+            clear, setBits = netForce[out]
+            value = (value & ~clear) | setBits
+        values[out] = value
+
+    # compare every machine with the good machine in bit 0
+    diff = 0
+    for out in compiled["OUTPUTS"]:
+        good = ones if values[out] & 1 else 0
+        diff |= values[out] ^ good
+
+    nextState = [values[d] for q, d in compiled["DFFS"]]
+    return diff & ones, nextState
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: state of the kept lanes (bit 0, the good machine, always stays) in a new, narrower packing
+def repack(state, lanes):
+    newState = []
+    for value in state:
+        newValue = value & 1
+        for k in range(len(lanes)):
+            newValue |= ((value >> lanes[k]) & 1) << (k + 1)
+        newState.append(newValue)
+    return newState
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: cycle at which each bitsim fault is first detected, -1 if it never is
+# groupSize limits how many faulty machines share one packed word (None = all of them)
+def detectCycles(compiled, faults, vectors, groupSize=None):
+    firsts = [-1] * len(faults)
+    if groupSize is None:
+        groupSize = max(1, len(faults))
+
+    for start in range(0, len(faults), groupSize):
+        # machine k + 1 of the word simulates fault running[k], None once it was detected
+        running = list(range(start, min(start + groupSize, len(faults))))
+        forces = buildForces([faults[f] for f in running])
+        ones = (1 << (len(running) + 1)) - 1
+        liveMask = ones ^ 1
+        state = [0] * len(compiled["DFFS"])
+
+        for cycle in range(len(vectors)):
+            diff, state = clockCycle(compiled, vectors[cycle], state, forces, ones)
+            diff &= liveMask
+            if diff == 0:
+                continue
+
+            # drop every machine that was just detected
+            liveMask ^= diff
+            while diff:
+                lane = diff & -diff
+                k = lane.bit_length() - 2
+                firsts[running[k]] = cycle
+                running[k] = None
+                diff ^= lane
+            if liveMask == 0:
+                break
+
+            # detected machines keep running until at least half of the word is dead weight, then the rest are
+            # repacked into a narrower word
+            live = [k for k in range(len(running)) if running[k] is not None]
+            if len(live) * 2 <= len(running):
+                state = repack(state, [k + 1 for k in live])
+                running = [running[k] for k in live]
+                forces = buildForces([faults[f] for f in running])
+                ones = (1 << (len(running) + 1)) - 1
+                liveMask = ones ^ 1
+
+    return firsts
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: coverage (%) after each batch, the sequence keeps running across batches like one long test
+def seqCoverage(compiled, faults, vectors, batchSize, batches=25):
+    firsts = detectCycles(compiled, faults, vectors[0:batchSize * batches])
+    coverage = []
+    for batch in range(batches):
+        last = (batch + 1) * batchSize
+        detected = len([first for first in firsts if first != -1 and first < last])
+        coverage.append(detected / len(faults) * 100)
+    return coverage
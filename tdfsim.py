@@ -0,0 +1,103 @@
+from __future__ import print_function
+
+import bitsim
+
+# Transition delay (slow-to-rise / slow-to-fall) fault simulation.
+#
+# Consecutive test vectors are used as launch/capture pairs: vector k - 1 sets the line to its initial value and
+# vector k launches the transition and captures the outputs. A slow-to-rise (STR) fault is detected by pair k if
+# the line is 0 under vector k - 1, and vector k detects the line stuck-at-0 (which needs the line at 1 under vector
+# k). Slow-to-fall (STF) is the same with the values swapped and stuck-at-1. Both vectors of every pair are in the
+# same packed bitsim values, so one good simulation plus one cone pass per fault checks all the pairs of a batch.
+#
+# Fault lines: "net-STR", "net-STF" for a line and "gate-IN-net-STR", "gate-IN-net-STF" for one gate input.
+#
+# Function List:
+# 0. genTransitionList: generates every transition fault of the circuit and prints them to a file
+# 1. parseTransition: turns one transition fault line into a bitsim fault and its initialization line
+# 2. detectPairs: bit mask of the capture vectors whose pair detects one fault
+# 3. tdfCoverage: fault coverage after every batch of a vector sequence, in the f_cvg.csv form
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: writes STR and STF for every line and every gate input pin, in the same order as genFaultList
+def genTransitionList(circuit, faultFile):
+    outFile = open(faultFile, "w")
+
+    for x in circuit["INPUTS"][1]:
+        outFile.write(x[5:] + "-STR\n")
+        outFile.write(x[5:] + "-STF\n")
+
+    for x in circuit["GATES"][1]:
+        outFile.write(x[5:] + "-STR\n")
+        outFile.write(x[5:] + "-STF\n")
+        for term in circuit[x][1]:
+            outFile.write(x[5:] + "-IN-" + term[5:] + "-STR\n")
+            outFile.write(x[5:] + "-IN-" + term[5:] + "-STF\n")
+
+    outFile.close()
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: turns a split transition fault line into (bitsim stuck-at fault, net index of the line, rising)
+# ["net", "STR"]               -> (("SA", net, 0), net, True)
+# ["gate", "IN", "net", "STF"] -> (("IN", gate position, (pins), 1), net, False)
+def parseTransition(compiled, fault):
+    if fault[-1] != "STR" and fault[-1] != "STF":
+        return "FAULT ERROR: UNKNOWN TRANSITION FAULT TYPE \"" + fault[-1] + "\""
+    rising = fault[-1] == "STR"
+
+    # the capture vector sees the late line as if it was still stuck at its initial value
+    stuck = bitsim.parseFault(compiled, fault[0:-1] + ["SA", "0" if rising else "1"])
+    if isinstance(stuck, str):
+        return stuck
+
+    if stuck[0] == "IN":
+        net = compiled["INDEX"]["wire_" + fault[2]]
+    else:
+        net = stuck[1]
+    return (stuck, net, rising)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: simulates one transition fault against the good values, returns a mask of the capture vectors that detect
+# it (bit k set = the pair (k - 1, k) detects the fault, so bit 0 is never set)
+def detectPairs(compiled, fault, good, ones):
+    stuck, net, rising = fault
+
+    # vectors where the line is at its final value, launched if it was at the initial value one vector before
+    final = good[net] if rising else good[net] ^ ones
+    launched = final & ((final ^ ones) << 1) & ones & ~1
+    if launched == 0:
+        return 0
+
+    return bitsim.detectMask(compiled, stuck, good, ones) & launched
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: coverage (%) after each batch, the last vector of a batch launches the first pair of the next one
+def tdfCoverage(compiled, faults, vectors, batchSize, batches=25):
+    width = len(compiled["INPUTS"])
+    active = list(range(len(faults)))
+    detected = 0
+
+    coverage = []
+    for batch in range(batches):
+        # bit 0 of the chunk only initializes: it is vector 0 or the last vector of the previous batch
+        start = batch * batchSize
+        chunk = vectors[max(0, start - 1):start + batchSize]
+        if len(chunk) > 1 and len(active) > 0:
+            ones = (1 << len(chunk)) - 1
+            good = bitsim.simulate(compiled, bitsim.packVectors(chunk, width), ones)
+
+            # detected faults are dropped from the next batches
+            stillActive = []
+            for f in active:
+                if detectPairs(compiled, faults[f], good, ones):
+                    detected += 1
+                else:
+                    stillActive.append(f)
+            active = stillActive
+
+        coverage.append(detected / len(faults) * 100)
+    return coverage
@@ -0,0 +1,229 @@
+from __future__ import print_function
+import mmap
+import os
+import struct
+
+# Packed binary test vector files (.tvb)
+#
+# Layout (all little-endian):
+#   header, 32 bytes: magic "TVB1", version (u16), generator (1 char), pad, seed (u32), width (u32),
+#                     count (u64), words per row (u32), reserved (u32)
+#   rows:             count rows of (words per row * 8) bytes, one row per vector
+#
+# A row is the vector as one integer, bit i = value of input i. That is the same bit order as the text files,
+# where the last character of a line is input 0, so int(line, 2) is the row. Rows are padded to whole 64-bit
+# words so every row starts on a word boundary.
+#
+# Reading packs the rows straight into bitsim input masks (bit v of mask i = input i of vector v) with a bit matrix
+# transpose done on the whole batch as one python int, so no vector is ever turned back into text.
+#
+# Function List:
+# 0. writeBin: writes a list of vector strings to a .tvb file
+# 1. openBin: memory maps a .tvb file and reads its header
+# 2. closeBin: releases the memory map of an opened .tvb file
+# 3. readRows: zero-copy view of a range of rows
+# 4. rowString: one row as a text vector line
+# 5. transposeMasks: masks used by each step of the 64 x 64 bit block transpose
+# 6. packRows: turns a view of rows into bitsim input masks
+# 7. iterBatches: yields batches of packed input masks ready for bitsim
+# 8. textToBin: converts a TV_*.txt file to .tvb
+# 9. binToText: converts a .tvb file back to TV_*.txt
+
+MAGIC = b"TVB1"
+VERSION = 1
+HEADER = struct.Struct("<4sHcxIIQI4x")
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: writes vector strings out as a packed binary file
+def writeBin(fileName, seed, generator, width, vectors):
+    rowWords = (width + 63) // 64
+    rowBytes = rowWords * 8
+
+    outFile = open(fileName, "wb")
+    outFile.write(HEADER.pack(MAGIC, VERSION, generator.encode("ascii"), seed, width, len(vectors), rowWords))
+    for line in vectors:
+        # only the last width bits are used, same as inputRead
+        outFile.write(int(line[len(line) - width:], 2).to_bytes(rowBytes, "little"))
+    outFile.close()
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: opens a packed binary file, the returned reader is a dictionary like the circuit one
+def openBin(fileName):
+    inFile = open(fileName, "rb")
+
+    # Error detection: an empty file can not be memory mapped
+    if os.fstat(inFile.fileno()).st_size < HEADER.size:
+        inFile.close()
+        msg = "VECTOR FILE ERROR: \"" + fileName + "\" IS NOT A PACKED VECTOR FILE"
+        print(msg + "\n")
+        return msg
+    data = mmap.mmap(inFile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Error detection: not a packed vector file
+    if data[0:4] != MAGIC:
+        data.close()
+        inFile.close()
+        msg = "VECTOR FILE ERROR: \"" + fileName + "\" IS NOT A PACKED VECTOR FILE"
+        print(msg + "\n")
+        return msg
+
+    magic, version, generator, seed, width, count, rowWords = HEADER.unpack_from(data, 0)
+    if version != VERSION:
+        data.close()
+        inFile.close()
+        msg = "VECTOR FILE ERROR: \"" + fileName + "\" HAS UNSUPPORTED VERSION " + str(version)
+        print(msg + "\n")
+        return msg
+
+    # Error detection: truncated (or padded) file, the header promises count rows
+    if len(data) != HEADER.size + count * rowWords * 8:
+        data.close()
+        inFile.close()
+        msg = "VECTOR FILE ERROR: \"" + fileName + "\" SHOULD HOLD " + str(count) + " VECTORS"
+        print(msg + "\n")
+        return msg
+
+    reader = {}
+    reader["FILE"] = inFile
+    reader["MMAP"] = data
+    reader["VIEW"] = memoryview(data)
+    reader["GENERATOR"] = generator.decode("ascii")
+    reader["SEED"] = seed
+    reader["WIDTH"] = width
+    reader["COUNT"] = count
+    reader["ROW_BYTES"] = rowWords * 8
+    return reader
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: closes the memory map and file behind a reader
+def closeBin(reader):
+    reader["VIEW"].release()
+    reader["MMAP"].close()
+    reader["FILE"].close()
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: view of rows [start, start + count) straight into the memory map, nothing is copied
+def readRows(reader, start, count):
+    count = max(0, min(count, reader["COUNT"] - start))
+    rowBytes = reader["ROW_BYTES"]
+    offset = HEADER.size + start * rowBytes
+    return reader["VIEW"][offset:offset + count * rowBytes]
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: row number row of a view as a text vector line
+def rowString(reader, view, row):
+    rowBytes = reader["ROW_BYTES"]
+    value = int.from_bytes(view[row * rowBytes:(row + 1) * rowBytes], "little")
+    return format(value, "0" + str(reader["WIDTH"]) + "b")
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: masks for the swap steps of a 64 x 64 bit block transpose, for blocks of 64 rows of rowBytes bytes
+# the mask of step j selects bit c of row r in every block where bit j of r is 0 and bit j of c is 1
+def transposeMasks(rowBytes):
+    masks = []
+    for j in [32, 16, 8, 4, 2, 1]:
+        word = 0
+        for c in range(64):
+            if c & j:
+                word |= 1 << c
+        row = word.to_bytes(8, "little") * (rowBytes // 8)
+        zero = bytes(rowBytes)
+        block = b"".join([zero if r & j else row for r in range(64)])
+        masks.append((j, block))
+    return masks
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: input masks (bit v of mask i = input i of row v) of count rows of a view
+# every 64 rows x 64 bits block is transposed in place, all blocks at once as one int: after the six swap steps row
+# r of a block holds input r of the block's 64 vectors, so an input's mask is a strided slice of 64-bit words
+def packRows(reader, view, count, masks=None):
+    rowBytes = reader["ROW_BYTES"]
+    rowWords = rowBytes // 8
+    blocks = (count + 63) // 64
+    if masks is None:
+        masks = transposeMasks(rowBytes)
+
+    size = blocks * 64 * rowBytes
+    data = int.from_bytes(view[0:count * rowBytes], "little")
+    for j, block in masks:
+        # bit c of row r swaps with bit c - j of row r + j, that is j * (row bits - 1) places up
+        shift = j * (rowBytes * 8 - 1)
+        swap = (data ^ (data >> shift)) & int.from_bytes(block * blocks, "little")
+        data ^= swap ^ (swap << shift)
+
+    words = memoryview(data.to_bytes(size, "little")).cast("Q")
+    ones = (1 << count) - 1
+    inputMasks = []
+    for i in range(reader["WIDTH"]):
+        column = words[(i % 64) * rowWords + i // 64::64 * rowWords]
+        inputMasks.append(int.from_bytes(column.tobytes(), "little") & ones)
+    return inputMasks
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: yields (first vector, vector count, input masks) for every batch of batchSize vectors
+def iterBatches(reader, batchSize, start=0):
+    masks = transposeMasks(reader["ROW_BYTES"])
+    while start < reader["COUNT"]:
+        view = readRows(reader, start, batchSize)
+        count = len(view) // reader["ROW_BYTES"]
+        if count == 0:
+            view.release()
+            break
+        inputMasks = packRows(reader, view, count, masks)
+        view.release()
+        yield start, count, inputMasks
+        start += count
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: converts a text vector file to a packed binary file
+def textToBin(textName, binName, generator, width=None):
+    inFile = open(textName, "r")
+    seed = 0
+    vectors = []
+    for line in inFile:
+        line = line.replace("\n", "")
+        line = line.replace(" ", "")
+        # Do nothing else if empty lines
+        if line == "":
+            continue
+        # the seed comment is kept in the header, any other comment is dropped
+        if line[0] == "#":
+            if line.startswith("#seed:"):
+                seed = int(line.replace("#seed:", ""))
+            continue
+        vectors.append(line)
+    inFile.close()
+
+    if width is None:
+        width = len(vectors[0]) if len(vectors) > 0 else 0
+    writeBin(binName, seed, generator, width, vectors)
+    return len(vectors)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: converts a packed binary file back to the text vector format
+def binToText(binName, textName):
+    reader = openBin(binName)
+    if isinstance(reader, str):
+        return reader
+
+    outFile = open(textName, "w")
+    outFile.write("#seed: " + str(reader["SEED"]) + "\n")
+    view = readRows(reader, 0, reader["COUNT"])
+    for row in range(reader["COUNT"]):
+        outFile.write(rowString(reader, view, row) + "\n")
+    view.release()
+    outFile.close()
+
+    count = reader["COUNT"]
+    closeBin(reader)
+    return count